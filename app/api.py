@@ -0,0 +1,145 @@
+# app/api.py
+import asyncio
+import json
+import os, sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from utils.config import config
+from utils.metrics import metrics
+from core.embeddings import EmbeddingManager
+from core.vector_store import VectorStore
+from core.retrieval_optimizer import RetrievalOptimizer
+from core.llm import LLMManager
+from core.history import ConversationMemory
+from core.registry import warm_up
+from core.answer_cache import get_answer_cache
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class SearchRequest(BaseModel):
+    query: str
+    k: int = Field(5, ge=1, le=50)
+    filters: Optional[Dict] = None
+
+
+class QueryRequest(BaseModel):
+    question: str
+    k: int = Field(5, ge=1, le=50)
+    filters: Optional[Dict] = None
+    history: List[Message] = []  # Earlier turns, without the current question
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load models and connect to the index once per worker process, before serving."""
+    config.validate()
+    config.ensure_directories()
+    await asyncio.to_thread(warm_up)
+    embedding_manager = EmbeddingManager()
+    vector_store = VectorStore()
+    app.state.embedding_manager = embedding_manager
+    app.state.retrieval_optimizer = RetrievalOptimizer(vector_store, embedding_manager=embedding_manager)
+    app.state.llm_manager = LLMManager()
+    app.state.answer_cache = get_answer_cache()
+    yield
+
+
+app = FastAPI(title=config.APP_TITLE, lifespan=lifespan)
+
+
+async def retrieve(request: Request, query: str, k: int, filters: Optional[Dict]):
+    """Embed the query off the event loop and return it with the relevant chunks."""
+    state = request.app.state
+    with metrics.span("query_embedding"):
+        embedding = await asyncio.to_thread(state.embedding_manager.embed_query, query)
+    with metrics.span("retrieval"):
+        chunks = await state.retrieval_optimizer.get_relevant_chunks(query, embedding, k=k, filters=filters)
+    return embedding, chunks
+
+
+def bounded_history(messages: List[Dict]) -> ConversationMemory:
+    """Client-sent turns within HISTORY_TOKEN_BUDGET; the oldest are dropped first."""
+    memory = ConversationMemory(summarizer=None)
+    for message in messages:
+        memory.add(message['role'], message['content'])
+    return memory
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms of the worker that serves this request."""
+    return metrics.render()
+
+
+@app.post("/search")
+async def search(body: SearchRequest, request: Request):
+    """Relevant chunks for a query, without generating an answer."""
+    _, chunks = await retrieve(request, body.query, body.k, body.filters)
+    return {"chunks": chunks}
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    """Answer a question, streamed as server-sent events.
+
+    Emits one `sources` event with the supporting chunks, `token` events with
+    the answer text, then `done`; failures are reported as an `error` event.
+    """
+    state = request.app.state
+    history = [message.model_dump() for message in body.history]
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            embedding, chunks = await retrieve(request, body.question, body.k, body.filters)
+            yield sse("sources", [{'text': chunk['text'], 'metadata': chunk['metadata']} for chunk in chunks])
+
+            # As in the chat app, only history-free questions use the answer cache
+            use_answer_cache = config.ANSWER_CACHE_ENABLED and not history
+            chunk_ids = [chunk['metadata']['chunk_id'] for chunk in chunks]
+            if use_answer_cache:
+                cached_answer = await asyncio.to_thread(state.answer_cache.lookup, embedding, chunk_ids)
+                if cached_answer is not None:
+                    yield sse("token", cached_answer)
+                    yield sse("done", {"cached": True})
+                    return
+
+            tokens = []
+            memory = await asyncio.to_thread(bounded_history, history)
+            async for token in state.llm_manager.astream_response(body.question, chunks, memory):
+                tokens.append(token)
+                yield sse("token", token)
+            if use_answer_cache:
+                await asyncio.to_thread(state.answer_cache.store, embedding, chunk_ids, "".join(tokens))
+            yield sse("done", {"cached": False})
+        except Exception as e:
+            yield sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Each worker is a separate process with its own warm models
+    uvicorn.run("app.api:app", host=config.API_HOST, port=config.API_PORT, workers=config.API_WORKERS)
@@ -2,20 +2,16 @@
 import streamlit as st
 from pathlib import Path
 import time
+import asyncio
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
 import os, sys
 from urllib.parse import urlencode
-from pinecone import Pinecone, ServerlessSpec
-
-#################
-# Please comment this line while working on local machine
-import sys
-sys.modules["sqlite3"] = __import__("pysqlite3")
-####################
-
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from utils.config import config
+from utils.metrics import metrics
+from utils.profiling import profiled
 
 # Set page config as the first Streamlit command
 st.set_page_config(
@@ -25,47 +21,34 @@ st.set_page_config(
 
 from core.embeddings import EmbeddingManager
 from core.vector_store import VectorStore
+from core.retrieval_optimizer import RetrievalOptimizer
 from core.llm import LLMManager
+from core.registry import registry, warm_up
+from core.answer_cache import get_answer_cache
+from core.history import ConversationMemory
 from components.chat import render_chat_interface
 
-def check_environment():
-    """Check if all required environment variables are set."""
-    missing_vars = []
-    
-    if not config.OPENAI_API_KEY:
-        missing_vars.append("OPENAI_API_KEY")
-    if not config.PINECONE_API_KEY:
-        missing_vars.append("PINECONE_API_KEY")
-    if not config.PINECONE_ENVIRONMENT:
-        missing_vars.append("PINECONE_ENVIRONMENT")
-    
-    if missing_vars:
-        error_msg = f"Missing required environment variables: {', '.join(missing_vars)}\n"
-        error_msg += "Please ensure these variables are set in your .env file or environment."
-        raise ValueError(error_msg)
-
 # Update the initialize_components function
 @st.cache_resource
 def initialize_components():
     try:
         # Check environment variables first
-        check_environment()
-        pc = Pinecone(
-            api_key=config.PINECONE_API_KEY,
-            environment=config.PINECONE_ENVIRONMENT
-        )
-
+        config.validate()
+        config.ensure_directories()
+        # Models and the index connection load in the background while the page
+        # renders; the first query waits for whatever is still loading
+        warm_up(wait=False)
+
+        embedding_manager = EmbeddingManager()
+        vector_store = VectorStore()
         components = {
-            'embedding_manager': EmbeddingManager(),
-            'vector_store': VectorStore(),
-            'llm_manager': LLMManager()
+            'embedding_manager': embedding_manager,
+            'vector_store': vector_store,
+            'retrieval_optimizer': RetrievalOptimizer(vector_store, embedding_manager=embedding_manager),
+            'llm_manager': LLMManager(),
+            'answer_cache': get_answer_cache()
         }
         
-        # Verify Pinecone index exists and is accessible
-        index = pc.Index(config.PINECONE_INDEX_NAME)
-        index_stats = index.describe_index_stats()
-        # st.sidebar.write(f"Pinecone Index Stats: {index_stats.total_vector_count} vectors")
-        
         return components
     except Exception as e:
         st.error(f"Initialization Error: {str(e)}")
@@ -80,7 +63,9 @@ if components is None:
 
 embedding_manager = components['embedding_manager']
 vector_store = components['vector_store']
+retrieval_optimizer = components['retrieval_optimizer']
 llm_manager = components['llm_manager']
+answer_cache = components['answer_cache']
 
 # Initialize session state
 if "chat_history" not in st.session_state:
@@ -89,8 +74,31 @@ if "current_sources" not in st.session_state:
     st.session_state.current_sources = []
 if "context_window" not in st.session_state:
     st.session_state.context_window = 5
-if "max_history" not in st.session_state:
-    st.session_state.max_history = 10
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory(summarizer=llm_manager.summarize_history)
+if "memory_update" not in st.session_state:
+    st.session_state.memory_update = None
+
+
+def update_memory(user_input: str, response: str):
+    """Add a finished turn to the memory in the background.
+
+    Adding may fold older turns through the LLM summarizer, which takes about
+    as long as a short answer, so it runs after the script run has finished
+    instead of delaying the redraw of the answer.
+    """
+    memory = st.session_state.memory
+    pool = registry.get("history:update_pool", lambda: ThreadPoolExecutor(max_workers=config.LLM_MAX_CONCURRENCY))
+    st.session_state.memory_update = pool.submit(
+        lambda: (memory.add("user", user_input), memory.add("assistant", response))
+    )
+
+
+def wait_for_memory():
+    """Finish the previous turn's memory update before the memory is read or cleared."""
+    update, st.session_state.memory_update = st.session_state.memory_update, None
+    if update is not None:
+        update.result()
 
 st.title(config.APP_TITLE)
 
@@ -98,6 +106,10 @@ st.title(config.APP_TITLE)
 if st.button("New Question"):
     st.session_state.chat_history = []
     st.session_state.current_sources = []
+    try:
+        wait_for_memory()
+    finally:
+        st.session_state.memory.clear()
     st.rerun()
 
 # Chat interface
@@ -114,44 +126,56 @@ if user_input:
         "content": user_input
     })
     
-    # Create a placeholder for the streaming response
-    with st.chat_message("assistant"):
-        response_placeholder = st.empty()
+    # Append ?profile=1 to the URL to profile requests of this session
+    with profiled("query", requested=st.query_params.get("profile") == "1", metadata={"question": user_input}):
+        # Create a placeholder for the streaming response
+        with st.chat_message("assistant"):
+            response_placeholder = st.empty()
         
-        try:
-            # Generate embedding for query
-            # st.write("Debug: Generating query embedding...")
-            query_embedding = embedding_manager.generate_embeddings([user_input])[0]
-            # st.write(f"Debug: Embedding generated, shape: {len(query_embedding)}")
+            try:
+                # Generate embedding for query
+                with metrics.span("query_embedding"):
+                    query_embedding = embedding_manager.embed_query(user_input)
             
-            # Search for relevant documents
-            # st.write("Debug: Searching for relevant documents...")
-            relevant_docs = vector_store.search(
-                user_input,
-                query_embedding,
-                k=st.session_state.context_window
-            )
-            # st.write(f"Debug: Found {len(relevant_docs)} relevant documents")
+                # Search for relevant documents
+                with metrics.span("retrieval"):
+                    relevant_docs = asyncio.run(retrieval_optimizer.get_relevant_chunks(
+                        user_input,
+                        query_embedding,
+                        k=st.session_state.context_window
+                    ))
             
-            # Generate streaming response
-            # st.write("Debug: Generating LLM response...")
-            response = llm_manager.generate_response(
-                user_input,
-                relevant_docs,
-                st.session_state.chat_history[-st.session_state.max_history:],
-                streaming_container=response_placeholder
-            )
+                # Answers only depend on question and chunks when there is no prior
+                # conversation, so only those turns use the semantic answer cache
+                use_answer_cache = config.ANSWER_CACHE_ENABLED and len(st.session_state.chat_history) == 1
+                chunk_ids = [doc['metadata']['chunk_id'] for doc in relevant_docs]
+                cached_answer = answer_cache.lookup(query_embedding, chunk_ids) if use_answer_cache else None
+
+                if cached_answer is not None:
+                    response = llm_manager.replay_response(cached_answer, response_placeholder)
+                else:
+                    wait_for_memory()
+                    # Generate streaming response
+                    response = llm_manager.generate_response(
+                        user_input,
+                        relevant_docs,
+                        st.session_state.memory,
+                        streaming_container=response_placeholder
+                    )
+                    if use_answer_cache:
+                        answer_cache.store(query_embedding, chunk_ids, response)
             
-            # Update chat history and sources
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": response
-            })
-            st.session_state.current_sources = relevant_docs
+                # Update chat history and sources
+                st.session_state.chat_history.append({
+                    "role": "assistant",
+                    "content": response
+                })
+                st.session_state.current_sources = relevant_docs
+                update_memory(user_input, response)
             
-        except Exception as e:
-            st.error(f"An error occurred during query processing: {str(e)}")
-            st.error("Full error details:", exc_info=True)
+            except Exception as e:
+                st.error(f"An error occurred during query processing: {str(e)}")
+                st.error("Full error details:", exc_info=True)
     
     # Rerun to update UI
     st.rerun()
@@ -7,24 +7,37 @@ import os, sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from utils.config import config
 from utils.s3_manager import S3Manager
-from core.document_processor import EnhancedDocumentProcessor
-from core.embeddings import EmbeddingManager
-from core.vector_store import VectorStore
+from core.job_queue import JobQueue, start_workers
 
 # Initialize session state
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = []
 
-# Initialize components
-doc_processor = EnhancedDocumentProcessor()
-embedding_manager = EmbeddingManager()
-vector_store = VectorStore()
-
 st.set_page_config(
     page_title=f"{config.APP_TITLE} - Document Upload",
     layout="wide"
 )
 
+@st.cache_resource
+def initialize_components():
+    # Parsing, embedding and upserts run in worker processes, not in this session
+    config.validate()
+    config.ensure_directories()
+    return {
+        'job_queue': JobQueue(),
+        'workers': []
+    }
+
+components = initialize_components()
+job_queue = components['job_queue']
+
+def ensure_workers():
+    """(Re)start worker processes if none are alive to drain the queue."""
+    workers = components['workers']
+    workers[:] = [worker for worker in workers if worker.is_alive()]
+    if not workers:
+        workers.extend(start_workers())
+
 st.title(f"{config.APP_TITLE} - Document Upload")
 
 # File upload section
@@ -40,24 +53,41 @@ if uploaded_files:
 
 if st.session_state.uploaded_files:
     st.write(f"{len(st.session_state.uploaded_files)} documents ready for processing.")
-    
+
+    profile = st.checkbox("Profile processing", help="Write CPU and memory profiles under the cache directory")
     if st.button("Process Documents"):
-        with st.spinner("Processing documents..."):
-            for file in st.session_state.uploaded_files:
-                file_path = config.DATA_DIR / file.name
-                with open(file_path, 'wb') as f:
-                    f.write(file.getvalue())
-                
-                # Process documents
-                chunks = doc_processor.process_file(file_path)
-                
-                # Generate embeddings
-                embeddings = embedding_manager.generate_embeddings(
-                    [chunk['text'] for chunk in chunks]
-                )
-                
-                # Store in vector database
-                vector_store.add_documents(chunks, embeddings)
-            
-            st.success("Documents processed and indexed!")
-            st.session_state.uploaded_files = []  # Clear uploaded files after processing
+        for file in st.session_state.uploaded_files:
+            file_path = config.DATA_DIR / file.name
+            with open(file_path, 'wb') as f:
+                f.write(file.getvalue())
+            job_queue.enqueue(file_path, profile=profile)
+
+        ensure_workers()
+        st.success("Documents queued for processing.")
+        st.session_state.uploaded_files = []  # Clear uploaded files after queueing
+
+# Job progress section
+jobs = job_queue.list_jobs()
+if jobs:
+    st.header("Processing Jobs")
+    for job in jobs:
+        if job['status'] == 'done':
+            st.write(
+                f"✅ {job['source']}: {job['changed_pages']} changed pages, "
+                f"{job['chunks_upserted']} chunks indexed, {job['chunks_deleted']} stale chunks removed "
+                f"({job['pages_per_second']:.1f} pages/s)"
+            )
+        elif job['status'] == 'failed':
+            st.error(f"{job['source']}: failed after {job['attempts']} attempts")
+        else:
+            progress = job['pages_done'] / job['total_pages'] if job['total_pages'] else 0.0
+            st.progress(
+                min(progress, 1.0),
+                text=f"{job['source']}: {job['status']}, {job['pages_done']}/{job['total_pages'] or '?'} pages "
+                     f"({job['pages_per_second']:.1f} pages/s)"
+            )
+
+    if job_queue.has_active_jobs():
+        ensure_workers()
+        time.sleep(config.JOB_POLL_INTERVAL)
+        st.rerun()
@@ -0,0 +1,213 @@
+# benchmarks/retrieval.py
+"""Retrieval quality and latency benchmark on a local vector backend.
+
+Runs a labelled question set (see core.evaluator.read_labels) through
+VectorStore.search and RetrievalOptimizer.get_relevant_chunks and reports
+recall@k, MRR, nDCG@k and context ROUGE-1 with p50/p95/p99 latency and
+throughput for each. Query embeddings are computed once up front, so the
+latencies cover retrieval only. Everything runs in-process: the FAISS
+backend, no redis, and HuggingFace models from the local cache.
+
+The FAISS index, lexical index, ingestion manifest and caches live in
+--index-dir, apart from the app's storage, so --ingest always builds the
+benchmark index and the app's indexes are never touched.
+
+    python benchmarks/retrieval.py labels.jsonl results/ --ingest data/ --baseline previous/summary.json
+
+The output directory gets summary.json (the aggregate numbers, plus deltas
+against --baseline when given) and per_query.jsonl.
+"""
+import os
+
+# Models must already be in the local HuggingFace cache
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import numpy as np
+from utils.config import config
+from core.evaluator import ResponseEvaluator, hit_matrix, read_labels, retrieval_metrics
+
+
+def latency_stats(seconds: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'mean_ms': float(values.mean())}
+
+
+async def run_sequential(fn: Callable, count: int):
+    """Results and per-call latencies, one call at a time."""
+    results, latencies = [], []
+    for i in range(count):
+        started = time.perf_counter()
+        result = await fn(i) if asyncio.iscoroutinefunction(fn) else fn(i)
+        latencies.append(time.perf_counter() - started)
+        results.append(result)
+    return results, latencies
+
+
+async def run_concurrent(fn: Callable, count: int, concurrency: int) -> float:
+    """Queries per second with `concurrency` callers; sync targets run on a thread pool."""
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async def call(i):
+            async with limit:
+                if asyncio.iscoroutinefunction(fn):
+                    return await fn(i)
+                return await loop.run_in_executor(pool, fn, i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(count)))
+        return count / (time.perf_counter() - started)
+
+
+async def evaluate(name: str, fn: Callable, labels: List[Dict], ks: List[int],
+                   concurrency: int, reset: Callable[[], None]):
+    reset()
+    results, latencies = await run_sequential(fn, len(labels))
+    reset()
+    throughput = await run_concurrent(fn, len(labels), concurrency)
+
+    hits, relevant_counts = hit_matrix(results, labels, max(ks))
+    rouge = ResponseEvaluator().evaluate_relevance([label['question'] for label in labels], results)
+    summary = {
+        **retrieval_metrics(hits, relevant_counts, ks),
+        'context_rouge1': float(rouge.mean()),
+        **latency_stats(latencies),
+        'throughput_qps': throughput,
+        'concurrency': concurrency
+    }
+    per_query = [
+        {'target': name, 'id': label['id'], 'question': label['question'],
+         'chunk_ids': [doc['metadata'].get('chunk_id') for doc in retrieved],
+         'hits': row_hits.astype(int).tolist(), 'latency_ms': latency * 1000, 'context_rouge1': float(score)}
+        for label, retrieved, row_hits, latency, score in zip(labels, results, hits, latencies, rouge)
+    ]
+    return summary, per_query
+
+
+def compare(summary: Dict, baseline: Dict) -> Dict[str, Dict[str, float]]:
+    """Current minus baseline for every shared numeric metric."""
+    deltas = {}
+    for target, scores in summary['targets'].items():
+        previous = baseline.get('targets', {}).get(target, {})
+        deltas[target] = {
+            metric: value - previous[metric] for metric, value in scores.items()
+            if isinstance(value, (int, float)) and isinstance(previous.get(metric), (int, float))
+        }
+    return deltas
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency on a local index.")
+    parser.add_argument("labels", type=Path, help=".jsonl file of questions with relevant chunk_ids/pages")
+    parser.add_argument("output", type=Path, help="Directory for summary.json and per_query.jsonl")
+    parser.add_argument("--ks", default="1,3,5,10", help="Comma-separated cutoffs for recall and nDCG")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent callers for throughput")
+    parser.add_argument("--ingest", type=Path, default=None, help="Index the PDFs in this directory first")
+    parser.add_argument("--index-dir", type=Path, default=config.BASE_DIR / "storage" / "benchmark",
+                        help="Where the benchmark index and its state are kept between runs")
+    parser.add_argument("--baseline", type=Path, default=None, help="summary.json of an earlier run to diff against")
+    args = parser.parse_args()
+    ks = sorted({int(k) for k in args.ks.split(",")})
+
+    # Local, uncached retrieval: every search must reach the index. Set before
+    # the core modules are imported, so their default paths point here too.
+    index_dir = args.index_dir
+    config.VECTOR_BACKEND = 'faiss'
+    config.FAISS_DIR = index_dir / "faiss"
+    config.CACHE_DIR = index_dir / "cache"
+    config.REDIS_URL = None
+    config.QUERY_CACHE_ENABLED = False
+
+    from core.embeddings import EmbeddingManager
+    from core.faiss_backend import FaissBackend
+    from core.ingestion_manifest import IngestionManifest
+    from core.lexical_index import InvertedIndex
+    from core.vector_store import VectorStore
+    from core.retrieval_optimizer import RetrievalOptimizer
+
+    embedding_manager = EmbeddingManager()
+    vector_store = VectorStore(
+        backend=FaissBackend(directory=index_dir / "faiss"),
+        lexical_index=InvertedIndex(index_dir / "lexical_index.sqlite3") if config.HYBRID_SEARCH_ENABLED else None
+    )
+    retrieval_optimizer = RetrievalOptimizer(vector_store, embedding_manager=embedding_manager)
+    if args.ingest:
+        from core.document_processor import EnhancedDocumentProcessor
+        from core.ingestion import DocumentIngestor
+        DocumentIngestor(
+            EnhancedDocumentProcessor(), embedding_manager, vector_store,
+            manifest=IngestionManifest(index_dir / "ingestion_manifest.sqlite3")
+        ).ingest_directory(args.ingest)
+
+    labels = read_labels(args.labels)
+    questions = [label['question'] for label in labels]
+    started = time.perf_counter()
+    embeddings = embedding_manager.embed_queries(questions)
+    embed_seconds = time.perf_counter() - started
+
+    def reset():
+        reranker = retrieval_optimizer.reranker
+        if reranker is not None:
+            reranker.score_cache.clear()
+
+    depth = max(ks)
+
+    def vector_search(i: int) -> List[Dict]:
+        return vector_store.search(questions[i], embeddings[i], k=depth)
+
+    async def retrieval(i: int) -> List[Dict]:
+        return await retrieval_optimizer.get_relevant_chunks(questions[i], embeddings[i], k=depth)
+
+    summary = {
+        'questions': len(labels),
+        'revision': git_revision(),
+        'config': {
+            'backend': config.VECTOR_BACKEND, 'index_dir': str(index_dir), 'faiss_index_type': config.FAISS_INDEX_TYPE,
+            'embedding_model': config.EMBEDDING_MODEL, 'chunk_size': config.CHUNK_SIZE,
+            'hybrid_search': config.HYBRID_SEARCH_ENABLED, 'reranker': config.RERANKER_ENABLED,
+            'mmr': config.MMR_ENABLED
+        },
+        'query_embedding_qps': len(labels) / embed_seconds if embed_seconds else None,
+        'targets': {}
+    }
+    per_query = []
+    for name, fn in (('vector_search', vector_search), ('retrieval', retrieval)):
+        summary['targets'][name], rows = asyncio.run(evaluate(name, fn, labels, ks, args.concurrency, reset))
+        per_query.extend(rows)
+
+    if args.baseline:
+        summary['baseline'] = str(args.baseline)
+        summary['deltas'] = compare(summary, json.loads(args.baseline.read_text()))
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    (args.output / "summary.json").write_text(json.dumps(summary, indent=2))
+    with open(args.output / "per_query.jsonl", 'w', encoding='utf-8') as f:
+        for row in per_query:
+            f.write(json.dumps(row) + "\n")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/startup.py
+"""Cold-start benchmark: import and build the query pipeline in fresh interpreters.
+
+Each run starts a new Python process with outbound connections and DNS
+lookups blocked, imports the query stack and optionally constructs its
+components. The run fails if any step tries to reach the network, pulls in
+a heavy optional backend eagerly, or the median time exceeds --max-seconds.
+
+    python benchmarks/startup.py --runs 5 --max-seconds 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported once a model or backend is actually used
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "faiss", "pinecone", "chromadb", "pysqlite3")
+
+PROBE = r"""
+import json, socket, sys, time
+attempts = []
+
+def blocked(*args, **kwargs):
+    attempts.append(repr(args[1:] if args and isinstance(args[0], socket.socket) else args)[:200])
+    raise OSError("network access during startup")
+
+socket.socket.connect = blocked
+socket.socket.connect_ex = blocked
+socket.create_connection = blocked
+socket.getaddrinfo = blocked
+
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+imported = None
+error = None
+try:
+    from utils.config import config
+    from core.embeddings import EmbeddingManager
+    from core.vector_store import VectorStore
+    from core.retrieval_optimizer import RetrievalOptimizer
+    from core.llm import LLMManager
+    from core.answer_cache import get_answer_cache
+    imported = time.perf_counter()
+    if {construct!r}:
+        embedding_manager = EmbeddingManager()
+        RetrievalOptimizer(VectorStore(), embedding_manager=embedding_manager)
+        LLMManager()
+        get_answer_cache()
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+finished = time.perf_counter()
+print(json.dumps({{
+    'import_seconds': (imported or finished) - started,
+    'total_seconds': finished - started,
+    'network_attempts': attempts,
+    'heavy_modules': sorted(name for name in {heavy!r} if name in sys.modules),
+    'error': error
+}}))
+"""
+
+
+def run_once(construct: bool) -> Dict:
+    code = PROBE.format(root=str(ROOT), construct=construct, heavy=HEAVY_MODULES)
+    # Constructing the chat model needs some key, but it is never sent anywhere
+    env = {**os.environ, 'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY') or 'startup-benchmark'}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, env=env)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'probe failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    ok = [run for run in runs if not run.get('error')]
+    summary = {
+        'runs': len(runs),
+        'errors': sorted({run['error'] for run in runs if run.get('error')}),
+        'network_attempts': sorted({attempt for run in runs for attempt in run.get('network_attempts', [])}),
+        'heavy_modules': sorted({name for run in runs for name in run.get('heavy_modules', [])}),
+    }
+    for key in ('import_seconds', 'total_seconds'):
+        values = [run[key] for run in ok]
+        summary[f'{key}_median'] = statistics.median(values) if values else None
+        summary[f'{key}_max'] = max(values) if values else None
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the query pipeline.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="Fail if the median import + construction time exceeds this")
+    parser.add_argument("--imports-only", action="store_true", help="Skip constructing the components")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    summary = summarize([run_once(construct=not args.imports_only) for _ in range(args.runs)])
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2))
+
+    failures = []
+    if summary['errors']:
+        failures.append(f"startup raised: {summary['errors']}")
+    if summary['network_attempts']:
+        failures.append(f"network access during startup: {summary['network_attempts']}")
+    if summary['heavy_modules']:
+        failures.append(f"heavy modules imported eagerly: {summary['heavy_modules']}")
+    median = summary['total_seconds_median']
+    if args.max_seconds is not None and median is not None and median > args.max_seconds:
+        failures.append(f"median startup {median:.2f}s exceeds {args.max_seconds:.2f}s")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# core/answer_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from utils.config import config
+from core.registry import registry, get_redis_client
+
+
+class SemanticAnswerCache:
+    """Cache of LLM answers keyed by the retrieved chunks and the query embedding.
+
+    Entries are grouped by the exact set of supporting chunk IDs. A question
+    hits the cache only if it retrieved the same chunks and its embedding is
+    within ANSWER_CACHE_SIMILARITY of a cached question, so paraphrases of a
+    FAQ reuse one answer. Because chunk IDs are content hashes, a changed
+    chunk also changes the set key; explicit invalidation additionally drops
+    every entry that referenced a rewritten or deleted chunk.
+
+    Stored in redis when REDIS_URL is set, otherwise in process memory.
+    """
+    prefix = "answer_cache"
+
+    def __init__(
+        self,
+        redis_client=None,
+        similarity_threshold: float = config.ANSWER_CACHE_SIMILARITY,
+        ttl: float = config.ANSWER_CACHE_TTL,
+        max_sets: int = config.ANSWER_CACHE_MAX_SETS,
+        entries_per_set: int = config.ANSWER_CACHE_ENTRIES_PER_SET
+    ):
+        self.client = redis_client
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_sets = max_sets
+        self.entries_per_set = entries_per_set
+        self._sets: OrderedDict = OrderedDict()  # set key -> (expires_at, [entry, ...], chunk ids)
+        self._chunk_index: Dict[str, set] = {}  # chunk id -> set keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _set_key(chunk_ids: Iterable[str]) -> str:
+        return hashlib.sha256("\n".join(sorted(set(chunk_ids))).encode()).hexdigest()
+
+    def _load_entries(self, set_key: str) -> List[Dict]:
+        if self.client is not None:
+            return [json.loads(raw) for raw in self.client.lrange(f"{self.prefix}:set:{set_key}", 0, -1)]
+        with self._lock:
+            item = self._sets.get(set_key)
+            if item is None:
+                return []
+            if item[0] < time.monotonic():
+                self._drop_set(set_key)
+                return []
+            self._sets.move_to_end(set_key)
+            return list(item[1])
+
+    def lookup(self, query_embedding: List[float], chunk_ids: List[str]) -> Optional[str]:
+        """Return a cached answer for a near-duplicate question with the same chunks."""
+        if not chunk_ids:
+            return None
+        entries = self._load_entries(self._set_key(chunk_ids))
+        if entries:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            matrix = np.asarray([entry['embedding'] for entry in entries], dtype=np.float32)
+            similarities = matrix @ query / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12
+            )
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                self.hits += 1
+                return entries[best]['answer']
+        self.misses += 1
+        return None
+
+    def store(self, query_embedding: List[float], chunk_ids: List[str], answer: str):
+        if not chunk_ids or not answer:
+            return
+        set_key = self._set_key(chunk_ids)
+        entry = {'embedding': [float(value) for value in query_embedding], 'answer': answer}
+
+        if self.client is not None:
+            list_key = f"{self.prefix}:set:{set_key}"
+            pipe = self.client.pipeline()
+            pipe.rpush(list_key, json.dumps(entry))
+            pipe.ltrim(list_key, -self.entries_per_set, -1)
+            pipe.expire(list_key, int(self.ttl))
+            for chunk_id in set(chunk_ids):
+                pipe.sadd(f"{self.prefix}:chunk:{chunk_id}", set_key)
+                pipe.expire(f"{self.prefix}:chunk:{chunk_id}", int(self.ttl))
+            pipe.execute()
+            return
+
+        with self._lock:
+            _, entries, _ = self._sets.pop(set_key, (None, [], None))
+            entries = (entries + [entry])[-self.entries_per_set:]
+            self._sets[set_key] = (time.monotonic() + self.ttl, entries, set(chunk_ids))
+            for chunk_id in set(chunk_ids):
+                self._chunk_index.setdefault(chunk_id, set()).add(set_key)
+            while len(self._sets) > self.max_sets:
+                self._drop_set(next(iter(self._sets)))
+
+    def _drop_set(self, set_key: str):
+        """Remove a set from the in-process store; caller holds the lock."""
+        item = self._sets.pop(set_key, None)
+        for chunk_id in (item[2] if item else ()):
+            keys = self._chunk_index.get(chunk_id)
+            if keys is not None:
+                keys.discard(set_key)
+                if not keys:
+                    del self._chunk_index[chunk_id]
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]):
+        """Drop every cached answer that was supported by any of these chunks."""
+        chunk_ids = list(chunk_ids)
+        if self.client is not None:
+            for i in range(0, len(chunk_ids), 500):
+                chunk_keys = [f"{self.prefix}:chunk:{chunk_id}" for chunk_id in chunk_ids[i:i + 500]]
+                pipe = self.client.pipeline()
+                for chunk_key in chunk_keys:
+                    pipe.smembers(chunk_key)
+                set_keys = set().union(*pipe.execute())
+                self.client.delete(*chunk_keys, *[
+                    f"{self.prefix}:set:{key.decode() if isinstance(key, bytes) else key}"
+                    for key in set_keys
+                ])
+            return
+
+        with self._lock:
+            for chunk_id in chunk_ids:
+                for set_key in list(self._chunk_index.get(chunk_id, ())):
+                    self._drop_set(set_key)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Shared answer cache for this process."""
+    return registry.get("answer_cache", lambda: SemanticAnswerCache(get_redis_client()))
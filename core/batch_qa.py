@@ -0,0 +1,208 @@
+# core/batch_qa.py
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.config import config
+from core.embeddings import EmbeddingManager
+from core.vector_store import VectorStore
+from core.retrieval_optimizer import RetrievalOptimizer
+from core.llm import LLMManager
+
+try:
+    from openai import RateLimitError
+except ImportError:  # Only needed to recognise rate-limit responses
+    RateLimitError = None
+
+COLUMNS = {
+    'id': 'string', 'question': 'string', 'answer': 'string', 'chunk_ids': 'list<string>',
+    'sources': 'string', 'error': 'string', 'embed_seconds': 'float64',
+    'retrieval_seconds': 'float64', 'llm_seconds': 'float64', 'first_token_seconds': 'float64'
+}
+
+
+def read_questions(path: Path) -> List[Dict[str, str]]:
+    """Questions from a .txt (one per line), .csv or .jsonl file with a 'question' field.
+
+    Questions without an 'id' get a hash of their text, so ids are stable
+    across runs and can be used to resume.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    elif path.suffix == '.jsonl':
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = [{'question': line.strip()} for line in f if line.strip()]
+
+    questions = {}
+    for row in rows:
+        question = row['question'].strip()
+        question_id = str(row.get('id') or hashlib.sha256(question.encode()).hexdigest()[:16])
+        questions.setdefault(question_id, {'id': question_id, 'question': question})
+    return list(questions.values())
+
+
+class ParquetPartWriter:
+    """Writes result rows as numbered Parquet part files in an output directory.
+
+    Each part is written atomically, so after a crash the directory holds
+    only complete parts and `completed_ids` tells which questions are done.
+    Failed questions are retried on the next run and appear again in a later
+    part. The directory reads as one table with `pandas.read_parquet(directory)`.
+    """
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.next_part = len(list(self.directory.glob("part-*.parquet")))
+
+    def completed_ids(self) -> set:
+        """IDs of questions answered without error."""
+        ids = set()
+        for part in self.directory.glob("part-*.parquet"):
+            table = pq.read_table(part, columns=['id', 'error'])
+            ids.update(
+                question_id for question_id, error in zip(table.column('id').to_pylist(), table.column('error').to_pylist())
+                if error is None
+            )
+        return ids
+
+    @staticmethod
+    def schema() -> pa.Schema:
+        types = {'string': pa.string(), 'float64': pa.float64(), 'list<string>': pa.list_(pa.string())}
+        return pa.schema([(column, types[kind]) for column, kind in COLUMNS.items()])
+
+    def write(self, rows: List[Dict]):
+        if not rows:
+            return
+        table = pa.Table.from_pylist(
+            [{column: row.get(column) for column in COLUMNS} for row in rows], schema=self.schema()
+        )
+        path = self.directory / f"part-{self.next_part:05d}.parquet"
+        tmp_path = path.with_suffix('.tmp')
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self.next_part += 1
+
+
+class BatchQARunner:
+    """Answers a file of questions with the full retrieval and generation pipeline.
+
+    Questions are embedded in large batches, retrieval runs concurrently and
+    LLM calls are bounded by BATCH_QA_LLM_CONCURRENCY, retrying rate-limited
+    requests with exponential backoff. Embedding the next batch overlaps with
+    generation for the previous one, so the LLM rate limit is the bottleneck.
+    """
+    def __init__(self, embedding_manager=None, retrieval_optimizer=None, llm_manager=None):
+        self.embedding_manager = embedding_manager or EmbeddingManager()
+        self.retrieval_optimizer = retrieval_optimizer or RetrievalOptimizer(
+            VectorStore(), embedding_manager=self.embedding_manager
+        )
+        self.llm_manager = llm_manager or LLMManager()
+
+    async def _generate(self, question: str, chunks: List[Dict], timings: Dict) -> str:
+        started = time.perf_counter()
+        for attempt in range(config.BATCH_QA_MAX_RETRIES + 1):
+            tokens = []
+            try:
+                async for token in self.llm_manager.astream_response(question, chunks):
+                    if not tokens:
+                        timings['first_token_seconds'] = time.perf_counter() - started
+                    tokens.append(token)
+                timings['llm_seconds'] = time.perf_counter() - started
+                return "".join(tokens)
+            except Exception as e:
+                if RateLimitError is None or not isinstance(e, RateLimitError) or attempt == config.BATCH_QA_MAX_RETRIES:
+                    raise
+                retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('retry-after')
+                await asyncio.sleep(float(retry_after) if retry_after else config.BATCH_QA_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _answer(self, item: Dict, embedding: List[float], embed_seconds: float,
+                      retrieval_limit: asyncio.Semaphore, llm_limit: asyncio.Semaphore) -> Dict:
+        row = {**item, 'embed_seconds': embed_seconds}
+        try:
+            async with retrieval_limit:
+                started = time.perf_counter()
+                chunks = await self.retrieval_optimizer.get_relevant_chunks(
+                    item['question'], embedding, k=config.BATCH_QA_CONTEXT_CHUNKS
+                )
+                row['retrieval_seconds'] = time.perf_counter() - started
+            row['chunk_ids'] = [chunk['metadata']['chunk_id'] for chunk in chunks]
+            row['sources'] = json.dumps([chunk['metadata'] for chunk in chunks], default=str)
+            async with llm_limit:
+                row['answer'] = await self._generate(item['question'], chunks, row)
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    async def run(self, questions_path: Path, output_dir: Path, progress_callback=None) -> Dict[str, int]:
+        """Answer every question not already in output_dir; returns counts."""
+        writer = ParquetPartWriter(output_dir)
+        done = writer.completed_ids()
+        pending = [item for item in read_questions(questions_path) if item['id'] not in done]
+
+        retrieval_limit = asyncio.Semaphore(config.BATCH_QA_RETRIEVAL_CONCURRENCY)
+        llm_limit = asyncio.Semaphore(config.BATCH_QA_LLM_CONCURRENCY)
+        tasks = set()
+        buffer: List[Dict] = []
+        stats = {'skipped': len(done), 'answered': 0, 'failed': 0}
+
+        async def drain(return_when):
+            nonlocal tasks
+            finished, tasks = await asyncio.wait(tasks, return_when=return_when)
+            for task in finished:
+                row = task.result()
+                buffer.append(row)
+                stats['failed' if row.get('error') else 'answered'] += 1
+            if len(buffer) >= config.BATCH_QA_FLUSH_ROWS:
+                await asyncio.to_thread(writer.write, list(buffer))
+                buffer.clear()
+            if progress_callback:
+                progress_callback(stats['answered'] + stats['failed'], len(pending))
+
+        batch_size = config.BATCH_QA_EMBED_BATCH
+        for start in range(0, len(pending), batch_size):
+            # Keep at most two embedding batches of questions in flight
+            while len(tasks) > batch_size:
+                await drain(asyncio.FIRST_COMPLETED)
+            batch = pending[start:start + batch_size]
+            started = time.perf_counter()
+            embeddings = await asyncio.to_thread(
+                self.embedding_manager.embed_queries, [item['question'] for item in batch]
+            )
+            embed_seconds = (time.perf_counter() - started) / len(batch)
+            for item, embedding in zip(batch, embeddings):
+                tasks.add(asyncio.create_task(
+                    self._answer(item, embedding, embed_seconds, retrieval_limit, llm_limit)
+                ))
+
+        while tasks:
+            await drain(asyncio.FIRST_COMPLETED)
+        await asyncio.to_thread(writer.write, buffer)
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batch.")
+    parser.add_argument("questions", type=Path, help=".txt, .csv or .jsonl file of questions")
+    parser.add_argument("output", type=Path, help="Directory of Parquet part files; reruns resume it")
+    args = parser.parse_args()
+
+    config.validate()
+    config.ensure_directories()
+    result = asyncio.run(BatchQARunner().run(
+        args.questions,
+        args.output,
+        progress_callback=lambda finished, total: print(f"\r{finished}/{total}", end="", flush=True)
+    ))
+    print(f"\n{result}")
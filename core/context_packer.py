@@ -0,0 +1,92 @@
+# core/context_packer.py
+import re
+from typing import Dict, List, Optional
+from utils.config import config
+from utils.cache import LRUCache
+from utils.helpers import generate_document_id
+from core.registry import registry, get_tokenizer
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class TokenCounter:
+    """tiktoken token counts for the chat model, cached by content hash."""
+    def __init__(self, model_name: str = config.LLM_MODEL):
+        self.model_name = model_name
+        self.cache = registry.get(
+            f"token_counts:{model_name}", lambda: LRUCache(max_size=config.TOKEN_COUNT_CACHE_SIZE)
+        )
+
+    @property
+    def encoding(self):
+        return get_tokenizer(self.model_name)
+
+    def count(self, text: str, key: Optional[str] = None) -> int:
+        """Token count of text; `key` defaults to its content hash (chunk IDs qualify)."""
+        key = key or generate_document_id(text)
+        count = self.cache.get(key)
+        if count is None:
+            count = len(self.encoding.encode(text, disallowed_special=()))
+            self.cache.set(key, count)
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of whole sentences within max_tokens."""
+        kept, used = [], 0
+        for sentence in SENTENCE_BOUNDARY.split(text):
+            tokens = self.count(sentence + " ")
+            if used + tokens > max_tokens:
+                break
+            kept.append(sentence)
+            used += tokens
+        return " ".join(kept)
+
+
+class ContextPacker:
+    """Fills a fixed token budget with retrieved chunks in retrieval order.
+
+    The order RetrievalOptimizer returns is kept, since dense, BM25 and fused
+    scores are not comparable. Chunks scored by the cross-encoder are skipped
+    when their score is below CONTEXT_MIN_SCORE_RATIO of the best one; chunks
+    without a cross-encoder score are never cut that way. The chunk that no
+    longer fits is cut at a sentence boundary if enough room is left.
+    """
+    separator = "\n\n"
+
+    def __init__(
+        self,
+        token_budget: int = config.CONTEXT_TOKEN_BUDGET,
+        min_score_ratio: float = config.CONTEXT_MIN_SCORE_RATIO,
+        min_truncated_tokens: int = config.CONTEXT_MIN_TRUNCATED_TOKENS,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.token_budget = token_budget
+        self.min_score_ratio = min_score_ratio
+        self.min_truncated_tokens = min_truncated_tokens
+        self.counter = counter or TokenCounter()
+
+    def pack(self, docs: List[Dict]) -> List[Dict]:
+        """Return the chunks to send, in the given order, with text cut to fit the budget."""
+        scores = [doc['relevance_score'] for doc in docs if 'relevance_score' in doc]
+        cutoff = self.min_score_ratio * max(scores) if scores and max(scores) > 0 else None
+        separator_tokens = self.counter.count(self.separator)
+
+        packed, remaining = [], self.token_budget
+        for doc in docs:
+            if cutoff is not None and doc.get('relevance_score', cutoff) < cutoff:
+                continue
+            cost = self.counter.count(doc['text'], doc['metadata'].get('chunk_id'))
+            cost += separator_tokens if packed else 0
+            if cost <= remaining:
+                packed.append(doc)
+                remaining -= cost
+                continue
+            if remaining >= self.min_truncated_tokens:
+                text = self.counter.truncate(doc['text'], remaining - separator_tokens)
+                if text:
+                    packed.append({**doc, 'text': text})
+            break
+        return packed
+
+    def format(self, docs: List[Dict]) -> str:
+        return self.separator.join(doc['text'] for doc in self.pack(docs))
@@ -0,0 +1,65 @@
+# core/diversity.py
+import re
+from typing import Dict, List, Set
+import numpy as np
+from utils.config import config
+
+
+def shingles(text: str, size: int = config.SHINGLE_SIZE) -> Set[int]:
+    """Hashed word n-grams of a text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(
+    docs: List[Dict],
+    threshold: float = config.DUPLICATE_OVERLAP_THRESHOLD,
+    size: int = config.SHINGLE_SIZE
+) -> List[Dict]:
+    """Keep docs in order, skipping any whose shingles are mostly contained in a kept doc.
+
+    Containment (shared shingles over the smaller set) also catches a short
+    chunk repeated inside a longer one, which Jaccard similarity would miss.
+    """
+    kept, kept_shingles = [], []
+    for doc in docs:
+        doc_shingles = shingles(doc['text'], size)
+        is_duplicate = any(
+            len(doc_shingles & other) >= threshold * min(len(doc_shingles), len(other))
+            for other in kept_shingles
+            if doc_shingles and other
+        )
+        if not is_duplicate:
+            kept.append(doc)
+            kept_shingles.append(doc_shingles)
+    return kept
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = config.MMR_LAMBDA
+) -> List[int]:
+    """Indices of k candidates balancing relevance against similarity to those already picked.
+
+    Pairwise similarities are computed once as a single matrix; each step
+    only updates every candidate's maximum similarity to the selection.
+    """
+    n = len(relevance)
+    if n == 0:
+        return []
+    matrix = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+    similarity = matrix @ matrix.T
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    for _ in range(min(k, n)):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * max_similarity, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return selected
@@ -1,5 +1,5 @@
 # core/document_processor.py
-from typing import List, Dict, Union, Optional
+from typing import List, Dict, Union, Optional, Tuple, Iterator, BinaryIO
 from pathlib import Path
 import PyPDF2
 import pdfplumber
@@ -7,11 +7,23 @@ import pandas as pd
 import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os, sys
+import json
+import re
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from utils.config import config
 from utils.helpers import generate_document_id
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from core.registry import registry
+from core.embeddings import EmbeddingManager
+
+# Path operators that draw rectangles, lines and curves, delimited like PDF tokens
+PATH_OPERATOR = re.compile(rb'(?<![^\s\])>])(?:re|l|c)(?![^\s/\[(<%])')
+# Text objects cannot construct paths, and their strings could look like operators
+TEXT_OBJECT = re.compile(rb'(?<![^\s\])>])BT(?![^\s/\[(<%]).*?(?<![^\s\])>])ET(?![^\s/\[(<%])', re.DOTALL)
 
 class DocumentContent:
     """Class to represent different types of content in a document."""
@@ -24,41 +36,75 @@ class DocumentContent:
 class SmartChunker:
     """Handles intelligent chunking of different content types."""
     def __init__(self, embeddings_model: str = config.EMBEDDING_MODEL):
-        self.embedder = HuggingFaceEmbeddings(
-            model_name=embeddings_model,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.embedding_manager = EmbeddingManager(embeddings_model)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=config.CHUNK_SIZE,
             chunk_overlap=config.CHUNK_OVERLAP,
             length_function=len,
         )
 
-    def _calculate_semantic_similarity(self, text1: str, text2: str) -> float:
-        """Calculate semantic similarity between two text chunks."""
-        emb1 = self.embedder.embed_documents([text1])[0]
-        emb2 = self.embedder.embed_documents([text2])[0]
-        return np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+    def _embed_batched(self, texts: List[str]) -> np.ndarray:
+        """Embed texts through the embedding cache and return a (n, dim) matrix.
+
+        Cache misses go to the model in one call, which encodes them in
+        EMBEDDING_BATCH_SIZE batches.
+        """
+        return np.asarray(self.embedding_manager.generate_embeddings(texts), dtype=np.float32)
+
+    @staticmethod
+    def _adjacent_similarities(matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity between each row and the next one, in a single pass."""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        normalized = matrix / np.clip(norms, 1e-12, None)
+        return np.einsum('ij,ij->i', normalized[:-1], normalized[1:])
 
-    def _merge_similar_chunks(self, chunks: List[str], similarity_threshold: float = 0.8) -> List[str]:
-        """Merge chunks that are semantically similar."""
+    def _merge_similar_chunks(
+        self,
+        chunks: List[str],
+        embeddings: np.ndarray,
+        similarity_threshold: float = config.SEMANTIC_MERGE_THRESHOLD
+    ) -> List[Tuple[str, Optional[List[float]]]]:
+        """Merge runs of adjacent chunks that are semantically similar.
+
+        Returns (text, embedding) pairs. Chunks that were not merged keep their
+        embedding so the indexing step can reuse it; merged chunks get None.
+        """
         if not chunks:
-            return chunks
+            return []
 
-        merged_chunks = [chunks[0]]
-        for chunk in chunks[1:]:
-            similarity = self._calculate_semantic_similarity(merged_chunks[-1], chunk)
+        similarities = self._adjacent_similarities(embeddings)
+        groups = [[0]]
+        for i, similarity in enumerate(similarities, 1):
             if similarity > similarity_threshold:
-                merged_chunks[-1] = f"{merged_chunks[-1]} {chunk}"
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+
+        merged = []
+        for group in groups:
+            if len(group) == 1:
+                merged.append((chunks[group[0]], embeddings[group[0]].tolist()))
             else:
-                merged_chunks.append(chunk)
-        return merged_chunks
+                merged.append((" ".join(chunks[i] for i in group), None))
+        return merged
+
+    def chunk_texts(self, texts: List[str]) -> List[List[Tuple[str, Optional[List[float]]]]]:
+        """Chunk several texts, embedding every candidate chunk in one batched pass."""
+        split_texts = [self.text_splitter.split_text(text) for text in texts]
+        candidates = [chunk for chunks in split_texts for chunk in chunks]
+        if not candidates:
+            return [[] for _ in texts]
+
+        embeddings = self._embed_batched(candidates)
+        results, offset = [], 0
+        for chunks in split_texts:
+            results.append(self._merge_similar_chunks(chunks, embeddings[offset:offset + len(chunks)]))
+            offset += len(chunks)
+        return results
 
     def chunk_text(self, text: str) -> List[str]:
         """Chunk text content with semantic understanding."""
-        initial_chunks = self.text_splitter.split_text(text)
-        return self._merge_similar_chunks(initial_chunks)
+        return [chunk for chunk, _ in self.chunk_texts([text])[0]]
 
     def chunk_table(self, table_df: pd.DataFrame) -> List[str]:
         """Convert table into textual chunks with context."""
@@ -80,69 +126,161 @@ class SmartChunker:
             
         return chunks
 
+def _has_table_structure(page: PyPDF2.PageObject) -> bool:
+    """Cheap pre-check: pdfplumber's default table finder needs ruling lines or boxes.
+
+    Scans the page's raw content stream for path-drawing operators without
+    interpreting it, so pages of plain text are never laid out by pdfminer.
+    Operators that only occur inside form XObjects are not seen.
+    """
+    contents = page.get_contents()
+    return contents is not None and PATH_OPERATOR.search(TEXT_OBJECT.sub(b" ", contents.get_data())) is not None
+
+def _read_page_range(stream: BinaryIO, reader: PyPDF2.PdfReader, start: int, end: int) -> List[Dict]:
+    """Extract text and raw tables for pages [start, end).
+
+    Text comes from PyPDF2, which is the only parser most pages go through.
+    pdfplumber lays out and searches for tables only the pages whose content
+    stream draws lines or boxes. `reader` parses `stream` lazily, so only the
+    objects of these pages are read.
+    """
+    pages = [
+        {'page_num': page_index + 1, 'text': reader.pages[page_index].extract_text(), 'tables': []}
+        for page_index in range(start, end)
+    ]
+    candidates = [page['page_num'] for page in pages if _has_table_structure(reader.pages[page['page_num'] - 1])]
+    if candidates:
+        with pdfplumber.open(stream, pages=candidates) as pdf:
+            for page_num, plumber_page in zip(candidates, pdf.pages):
+                pages[page_num - 1 - start]['tables'] = plumber_page.extract_tables()
+    return pages
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) with one open file and one reader.
+
+    Runs inside a worker process, so it only returns plain picklable data.
+    """
+    with open(file_path, 'rb') as stream:
+        return _read_page_range(stream, PyPDF2.PdfReader(stream), start, end)
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    """Shared process pool for page extraction (spawned, so no model state is forked)."""
+    return registry.get("pdf:extraction_pool", lambda: ProcessPoolExecutor(
+        max_workers=config.PDF_EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    ))
+
 class EnhancedDocumentProcessor:
     """Enhanced document processor with smart chunking and content type handling."""
     def __init__(self):
         self.chunker = SmartChunker()
 
-    def _extract_tables(self, pdf_path: Path) -> List[Dict]:
-        """Extract tables from PDF with enhanced metadata."""
+    def count_pages(self, file_path: Path) -> int:
+        with open(file_path, 'rb') as stream:
+            return len(PyPDF2.PdfReader(stream).pages)
+
+    def iter_pages(self, file_path: Path, total_pages: Optional[int] = None) -> Iterator[Dict]:
+        """Yield extracted pages in document order, spreading page ranges across a process pool.
+
+        At most INGEST_WINDOW page ranges are in flight, so memory stays bounded
+        and extraction overlaps with whatever the consumer does with each page.
+        """
+        if total_pages is None:
+            total_pages = self.count_pages(file_path)
+        ranges = [
+            (start, min(start + config.PDF_PAGES_PER_TASK, total_pages))
+            for start in range(0, total_pages, config.PDF_PAGES_PER_TASK)
+        ]
+
+        if len(ranges) <= 1 or config.PDF_EXTRACTION_WORKERS <= 1:
+            with open(file_path, 'rb') as stream:
+                reader = PyPDF2.PdfReader(stream)
+                for start, end in ranges:
+                    yield from _read_page_range(stream, reader, start, end)
+            return
+
+        pool = _get_extraction_pool()
+        remaining = iter(ranges)
+        pending = deque(
+            pool.submit(_extract_page_range, str(file_path), start, end)
+            for start, end in islice(remaining, config.INGEST_WINDOW)
+        )
+        while pending:
+            batch = pending.popleft().result()
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(pool.submit(_extract_page_range, str(file_path), *next_range))
+            yield from batch
+
+    def extract_pages(self, file_path: Path) -> Tuple[int, List[Dict]]:
+        """Extract every page of a PDF at once."""
+        total_pages = self.count_pages(file_path)
+        return total_pages, list(self.iter_pages(file_path, total_pages))
+
+    def _extract_tables(self, pages: List[Dict]) -> List[Dict]:
+        """Build table data with enhanced metadata from extracted pages."""
         tables_data = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                tables = page.extract_tables()
-                for table_num, table in enumerate(tables, 1):
-                    if table and any(any(cell for cell in row) for row in table):
-                        df = pd.DataFrame(table[1:], columns=table[0])
-                        tables_data.append({
-                            'table': df,
-                            'page_num': page_num,
-                            'table_num': table_num,
-                            'row_count': len(df),
-                            'col_count': len(df.columns)
-                        })
+        for page in pages:
+            for table_num, table in enumerate(page['tables'], 1):
+                if table and any(any(cell for cell in row) for row in table):
+                    df = pd.DataFrame(table[1:], columns=table[0])
+                    tables_data.append({
+                        'table': df,
+                        'page_num': page['page_num'],
+                        'table_num': table_num,
+                        'row_count': len(df),
+                        'col_count': len(df.columns)
+                    })
         return tables_data
 
-    def _extract_text_by_page(self, pdf_reader: PyPDF2.PdfReader) -> List[DocumentContent]:
+    def _extract_text_by_page(self, pages: List[Dict]) -> List[DocumentContent]:
         """Extract text content by page with structural understanding."""
         contents = []
-        for page_num, page in enumerate(pdf_reader.pages, 1):
-            text = page.extract_text()
+        for page in pages:
+            text = page['text']
             if text.strip():
                 contents.append(DocumentContent(
                     content=text,
                     content_type='text',
-                    page_num=page_num,
+                    page_num=page['page_num'],
                     metadata={'type': 'main_text'}
                 ))
         return contents
 
+    @staticmethod
+    def page_hash(page: Dict) -> str:
+        """Content hash of an extracted page (text plus raw tables)."""
+        return generate_document_id(json.dumps([page['text'], page['tables']], default=str))
+
     def process_file(self, file_path: Path) -> List[Dict[str, str]]:
         """Process a file with enhanced content type handling and chunking."""
         if file_path.suffix.lower() != '.pdf':
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
 
-        # Extract all content
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text_contents = self._extract_text_by_page(pdf_reader)
-            tables_data = self._extract_tables(file_path)
+        total_pages, pages = self.extract_pages(file_path)
+        return self.chunk_pages(file_path, total_pages, pages)
+
+    def chunk_pages(self, file_path: Path, total_pages: int, pages: List[Dict]) -> List[Dict[str, str]]:
+        """Chunk a subset of already extracted pages of `file_path`."""
+        text_contents = self._extract_text_by_page(pages)
+        tables_data = self._extract_tables(pages)
 
         # Process and chunk all content
         processed_chunks = []
         
-        # Process text content
-        for text_content in text_contents:
-            chunks = self.chunker.chunk_text(text_content.content)
-            for chunk in chunks:
+        # Process text content; all pages are embedded together during merging
+        page_chunks = self.chunker.chunk_texts([content.content for content in text_contents])
+        for text_content, chunks in zip(text_contents, page_chunks):
+            for chunk, embedding in chunks:
                 processed_chunks.append({
                     'text': chunk,
+                    'embedding': embedding,
                     'metadata': {
                         'source': file_path.name,
                         'chunk_id': generate_document_id(chunk),
                         'page_num': text_content.page_num,
                         'content_type': 'text',
-                        'total_pages': len(pdf_reader.pages)
+                        'total_pages': total_pages
                     }
                 })
 
@@ -152,6 +290,7 @@ class EnhancedDocumentProcessor:
             for chunk in table_chunks:
                 processed_chunks.append({
                     'text': chunk,
+                    'embedding': None,
                     'metadata': {
                         'source': file_path.name,
                         'chunk_id': generate_document_id(chunk),
@@ -160,7 +299,7 @@ class EnhancedDocumentProcessor:
                         'table_num': table_data['table_num'],
                         'row_count': table_data['row_count'],
                         'col_count': table_data['col_count'],
-                        'total_pages': len(pdf_reader.pages)
+                        'total_pages': total_pages
                     }
                 })
 
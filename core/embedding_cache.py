@@ -0,0 +1,119 @@
+# core/embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from utils.config import config
+from utils.storage import file_lock, in_batches
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: the model name plus a hash of the text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingStore:
+    """Disk-backed, memory-mapped float32 store of embeddings keyed by content hash.
+
+    Vectors are appended to a flat `vectors.f32` file and read back through a
+    memory map; a SQLite table maps each key to its row. One store per model,
+    shared by every process on the machine.
+    """
+    def __init__(self, model_name: str, directory: Path = config.CACHE_DIR / "embeddings"):
+        self.directory = Path(directory) / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.db_path = self.directory / "index.sqlite3"
+        self.vectors_path.touch(exist_ok=True)
+        self._lock = threading.RLock()
+        self._mmap: Optional[np.memmap] = None
+        self.dimension: Optional[int] = None
+
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._load_dimension()
+
+    def _load_dimension(self):
+        """Read the vector dimension, which is fixed by whichever process wrote first."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+        if row:
+            self.dimension = int(row[0])
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _write_lock(self):
+        return file_lock(self.directory / "write.lock", self._lock)
+
+    def _rows_on_disk(self) -> int:
+        return os.path.getsize(self.vectors_path) // (4 * self.dimension)
+
+    def _vectors(self, min_rows: int) -> np.ndarray:
+        """Memory map covering at least `min_rows` rows, remapped when the file grows."""
+        with self._lock:
+            if self._mmap is None or self._mmap.shape[0] < min_rows:
+                rows = self._rows_on_disk()
+                self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                       shape=(rows, self.dimension))
+            return self._mmap
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors for whichever keys are present."""
+        if self.dimension is None:
+            self._load_dimension()
+        if self.dimension is None or not keys:
+            return {}
+        found = {}
+        with self._connect() as conn:
+            for batch, placeholders in in_batches(keys):
+                found.update(conn.execute(
+                    f"SELECT key, row FROM embeddings WHERE key IN ({placeholders})", batch
+                ))
+        if not found:
+            return {}
+        vectors = self._vectors(max(found.values()) + 1)
+        return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Append vectors for keys that are not stored yet."""
+        if not keys:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._write_lock(), self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dimension is None:
+                    self._load_dimension()
+                if self.dimension is None:
+                    self.dimension = vectors.shape[1]
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dimension', ?)",
+                                 (str(self.dimension),))
+                existing = set(self.get_many(keys))
+                new = [(key, vector) for key, vector in zip(keys, vectors) if key not in existing]
+                if new:
+                    start_row = self._rows_on_disk()
+                    with open(self.vectors_path, 'r+b') as f:
+                        # Drop any partial row left by an interrupted write before appending
+                        f.truncate(start_row * 4 * self.dimension)
+                        f.seek(0, os.SEEK_END)
+                        f.write(np.stack([vector for _, vector in new]).tobytes())
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, row) VALUES (?, ?)",
+                        [(key, start_row + i) for i, (key, _) in enumerate(new)]
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
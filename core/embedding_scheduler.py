@@ -0,0 +1,73 @@
+# core/embedding_scheduler.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+from utils.config import config
+from utils.metrics import metrics
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class EmbeddingScheduler:
+    """Coalesces concurrent single-text embedding requests into batched forward passes.
+
+    Callers on any thread submit a text and wait on a future. A background
+    thread takes the first waiting request, keeps collecting for up to
+    `max_delay` seconds or until `max_batch_size` texts are queued, embeds
+    the batch with one call to `embed_batch` and resolves every future.
+
+    Batch sizes are exported as rag_embedding_batch_size, and the time each
+    request waited for its batch as the embedding_queue stage, so
+    EMBEDDING_BATCH_WINDOW can be tuned from /metrics.
+    """
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = config.EMBEDDING_BATCH_SIZE,
+        max_delay: float = config.EMBEDDING_BATCH_WINDOW
+    ):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            metrics.observe_value("rag_embedding_batch_size", len(batch), BATCH_SIZE_BUCKETS,
+                                  "Query embedding requests per model call.")
+            for _, _, queued_at in batch:
+                metrics.observe("embedding_queue", started - queued_at)
+            try:
+                vectors = self.embed_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
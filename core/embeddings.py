@@ -1,16 +1,83 @@
 # core/embeddings.py
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from utils.config import config
+from utils.cache import LRUCache
+from core.registry import get_embedder, registry
+from core.embedding_cache import EmbeddingStore, embedding_key
+from core.embedding_scheduler import EmbeddingScheduler
 from typing import List
 
 class EmbeddingManager:
-    def __init__(self):
-        self.model = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+    """Embeds texts with the shared model behind a two-tier, content-addressed cache.
+
+    Query embeddings go through an in-memory LRU; document embeddings are
+    kept in a disk-backed store, so re-ingesting or re-indexing a corpus only
+    embeds text the model has never seen.
+    """
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.query_cache = registry.get(
+            f"embedding_query_cache:{model_name}",
+            lambda: LRUCache(max_size=config.QUERY_EMBEDDING_CACHE_SIZE)
         )
+        self.store = registry.get(
+            f"embedding_store:{model_name}",
+            lambda: EmbeddingStore(model_name)
+        ) if config.EMBEDDING_CACHE_ENABLED else None
+        self.scheduler = registry.get(
+            f"embedding_scheduler:{model_name}",
+            lambda: EmbeddingScheduler(self._encode_queries)
+        ) if config.EMBEDDING_MICROBATCH_ENABLED else None
     
+    @property
+    def model(self):
+        """The shared embedder, loaded on first use rather than at construction."""
+        return get_embedder(self.model_name)
+
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts."""
-        return self.model.embed_documents(texts)
\ No newline at end of file
+        """Generate embeddings for a list of texts.
+
+        Only cache misses are sent to the model, deduplicated, in one call.
+        """
+        if self.store is None:
+            return self.model.embed_documents(texts)
+
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+        misses = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if misses:
+            miss_keys = list(misses)
+            vectors = self.model.embed_documents([misses[key] for key in miss_keys])
+            self.store.put_many(miss_keys, vectors)
+            cached.update(zip(miss_keys, vectors))
+        return [[float(value) for value in cached[key]] for key in keys]
+
+    def _encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries in one model call and remember them in the LRU."""
+        unique = list(dict.fromkeys(queries))
+        vectors = dict(zip(unique, self.model.embed_documents(unique)))
+        for query, vector in vectors.items():
+            self.query_cache.set(embedding_key(self.model_name, query), vector)
+        return [vectors[query] for query in queries]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed user queries through the in-memory LRU."""
+        keys = [embedding_key(self.model_name, query) for query in queries]
+        results = [self.query_cache.get(key) for key in keys]
+        misses = [query for query, result in zip(queries, results) if result is None]
+        if misses:
+            vectors = dict(zip(misses, self._encode_queries(misses)))
+            results = [vectors.get(query, result) for query, result in zip(queries, results)]
+        return results
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed one user query.
+
+        Cache misses go through the shared scheduler, which batches queries
+        arriving concurrently from other sessions into one forward pass.
+        """
+        if self.scheduler is None:
+            return self.embed_queries([query])[0]
+        cached = self.query_cache.get(embedding_key(self.model_name, query))
+        if cached is not None:
+            return cached
+        return self.scheduler.embed(query)
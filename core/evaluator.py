@@ -1,26 +1,121 @@
-# # core/evaluator.py
-# from typing import List, Dict
-# import numpy as np
-# from rouge_score import rouge_scorer
-
-# class ResponseEvaluator:
-#     def __init__(self):
-#         self.rouge_scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
-    
-#     def evaluate_relevance(self, query: str, context: List[Dict]) -> float:
-#         """Evaluate relevance of retrieved documents."""
-#         scores = []
-#         for doc in context:
-#             rouge_scores = self.rouge_scorer.score(query, doc['text'])
-#             scores.append(rouge_scores['rougeL'].fmeasure)
-#         return np.mean(scores)
-    
-#     def evaluate_response(self, response: str, context: List[Dict]) -> Dict[str, float]:
-#         """Evaluate generated response against context."""
-#         context_text = " ".join([doc['text'] for doc in context])
-#         rouge_scores = self.rouge_scorer.score(context_text, response)
-        
-#         return {
-#             'relevance': rouge_scores['rougeL'].fmeasure,
-#             'factuality': rouge_scores['rouge2'].fmeasure
-#         }
\ No newline at end of file
+# core/evaluator.py
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def read_labels(path: Path) -> List[Dict]:
+    """Labelled questions from a .jsonl file.
+
+    Each line has a 'question' and the relevant 'chunk_ids' and/or 'pages',
+    given as {"source": ..., "page_num": ...} objects or [source, page_num]
+    pairs. A retrieved chunk is relevant if its chunk ID or its page is listed.
+    """
+    labels = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            pages = [
+                (page['source'], int(page['page_num'])) if isinstance(page, dict) else (page[0], int(page[1]))
+                for page in row.get('pages', [])
+            ]
+            relevant = [('chunk', chunk_id) for chunk_id in row.get('chunk_ids', [])] + [('page', page) for page in pages]
+            if not relevant:
+                raise ValueError(f"{path}:{number}: no relevant 'chunk_ids' or 'pages'")
+            labels.append({'id': str(row.get('id', number)), 'question': row['question'], 'relevant': relevant})
+    return labels
+
+
+def hit_matrix(results: Sequence[List[Dict]], labels: Sequence[Dict], depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Binary relevance of each result rank, and the number of relevant items per question.
+
+    Every labelled item counts once: a chunk from an already matched page is
+    not a second hit, so page labels cannot inflate recall or nDCG.
+    """
+    hits = np.zeros((len(labels), depth), dtype=np.float64)
+    for row, (retrieved, label) in enumerate(zip(results, labels)):
+        remaining = set(label['relevant'])
+        for rank, doc in enumerate(retrieved[:depth]):
+            metadata = doc['metadata']
+            for item in (('chunk', metadata.get('chunk_id')), ('page', (metadata.get('source'), metadata.get('page_num')))):
+                if item in remaining:
+                    remaining.discard(item)
+                    hits[row, rank] = 1.0
+                    break
+    relevant_counts = np.array([len(set(label['relevant'])) for label in labels], dtype=np.float64)
+    return hits, relevant_counts
+
+
+def retrieval_metrics(hits: np.ndarray, relevant_counts: np.ndarray, ks: Sequence[int]) -> Dict[str, float]:
+    """Mean recall@k, nDCG@k and MRR over the evaluation set, from a hit matrix."""
+    depth = hits.shape[1]
+    discounts = 1.0 / np.log2(np.arange(2, depth + 2))
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, np.inf)
+    scores = {'mrr': float(np.mean(1.0 / first_hit))}
+    for k in ks:
+        k = min(k, depth)
+        dcg = hits[:, :k] @ discounts[:k]
+        ideal = np.cumsum(discounts[:k])[np.minimum(relevant_counts, k).astype(int) - 1]
+        scores[f'recall@{k}'] = float(np.mean(hits[:, :k].sum(axis=1) / relevant_counts))
+        scores[f'ndcg@{k}'] = float(np.mean(dcg / ideal))
+    return scores
+
+
+def _ngram_ids(texts: Sequence[str], n: int, vocabulary: Dict[Tuple[str, ...], int]) -> Tuple[np.ndarray, np.ndarray]:
+    rows, ids = [], []
+    for row, text in enumerate(texts):
+        words = WORD_PATTERN.findall(text.lower())
+        for i in range(len(words) - n + 1):
+            ids.append(vocabulary.setdefault(tuple(words[i:i + n]), len(vocabulary)))
+            rows.append(row)
+    return np.array(rows, dtype=np.int64), np.array(ids, dtype=np.int64)
+
+
+def rouge_n(references: Sequence[str], candidates: Sequence[str], n: int = 1) -> np.ndarray:
+    """ROUGE-N F-measure of each candidate against its reference, for the whole set at once.
+
+    Texts are turned into n-gram ids once; clipped overlaps are then counted
+    with sorted-array intersections instead of per-pair Python loops.
+    """
+    vocabulary: Dict[Tuple[str, ...], int] = {}
+    ref_rows, ref_ids = _ngram_ids(references, n, vocabulary)
+    cand_rows, cand_ids = _ngram_ids(candidates, n, vocabulary)
+    size, count = max(len(vocabulary), 1), len(references)
+
+    ref_keys, ref_counts = np.unique(ref_rows * size + ref_ids, return_counts=True)
+    cand_keys, cand_counts = np.unique(cand_rows * size + cand_ids, return_counts=True)
+    common, ref_index, cand_index = np.intersect1d(ref_keys, cand_keys, assume_unique=True, return_indices=True)
+    overlap = np.bincount(common // size, weights=np.minimum(ref_counts[ref_index], cand_counts[cand_index]),
+                          minlength=count)
+
+    ref_totals = np.bincount(ref_rows, minlength=count)
+    cand_totals = np.bincount(cand_rows, minlength=count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recall = np.where(ref_totals > 0, overlap / ref_totals, 0.0)
+        precision = np.where(cand_totals > 0, overlap / cand_totals, 0.0)
+        return np.where(overlap > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+
+class ResponseEvaluator:
+    """Lexical-overlap scores for whole evaluation sets.
+
+    ROUGE-L needs a longest-common-subsequence per pair, which cannot be
+    vectorized, so relevance uses ROUGE-1 and factuality ROUGE-2.
+    """
+    def evaluate_relevance(self, queries: Sequence[str], contexts: Sequence[List[Dict]]) -> np.ndarray:
+        """Overlap of each query with the text of its retrieved documents."""
+        return rouge_n(queries, [" ".join(doc['text'] for doc in context) for context in contexts], n=1)
+
+    def evaluate_response(self, responses: Sequence[str], contexts: Sequence[List[Dict]]) -> Dict[str, np.ndarray]:
+        """Overlap of each generated response with its context."""
+        context_texts = [" ".join(doc['text'] for doc in context) for context in contexts]
+        return {
+            'relevance': rouge_n(context_texts, responses, n=1),
+            'factuality': rouge_n(context_texts, responses, n=2)
+        }
@@ -0,0 +1,253 @@
+# core/faiss_backend.py
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import faiss
+from utils.config import config
+from utils.storage import file_lock, in_batches
+from core.vector_backends import matches_filters
+
+
+class FaissBackend:
+    """Local, in-process vector backend persisted under DB_DIR.
+
+    Vectors and metadata live in SQLite, which is the source of truth; the
+    FAISS index is rebuilt from it when needed and written to disk on flush.
+    Supports exact ('flat') search and approximate 'hnsw' and 'ivf' indexes.
+    Scores are inner products of normalized embeddings, i.e. cosine
+    similarity, matching the Pinecone index.
+    """
+    def __init__(
+        self,
+        directory: Path = config.FAISS_DIR,
+        index_type: str = config.FAISS_INDEX_TYPE,
+        dimension: int = config.EMBEDDING_DIMENSION
+    ):
+        if index_type not in ('flat', 'hnsw', 'ivf'):
+            raise ValueError(f"Unsupported FAISS index type: {index_type}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_type = index_type
+        self.dimension = dimension
+        self.index_path = self.directory / f"{index_type}.faiss"
+        self.db_path = self.directory / "vectors.sqlite3"
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
+        self._dirty = False
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vectors (
+                    int_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id TEXT UNIQUE NOT NULL,
+                    embedding BLOB NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+            """)
+        with self._write_lock():
+            self._load()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _write_lock(self):
+        """Serialize writers across threads and processes sharing the directory."""
+        return file_lock(self.directory / "write.lock", self._lock)
+
+    def _new_index(self) -> faiss.Index:
+        if self.index_type == 'hnsw':
+            base = faiss.IndexHNSWFlat(self.dimension, config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            # IVF starts out flat until there are enough vectors to train on
+            base = faiss.IndexFlatIP(self.dimension)
+        return faiss.IndexIDMap2(base)
+
+    @staticmethod
+    def _base_index(index: faiss.Index) -> faiss.Index:
+        """The underlying index, unwrapping an id map if present."""
+        if isinstance(index, faiss.IndexIDMap):
+            return faiss.downcast_index(index.index)
+        return index
+
+    @classmethod
+    def _configure_search(cls, index: faiss.Index) -> faiss.Index:
+        """Apply search-time parameters, which are not stored in the index file."""
+        base = cls._base_index(index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = config.FAISS_HNSW_EF_SEARCH
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = config.FAISS_IVF_NPROBE
+        return index
+
+    def _count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _rebuild(self):
+        """Build a fresh index from every live vector in SQLite."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT int_id, embedding FROM vectors").fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        vectors = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.float32).reshape(-1, self.dimension)
+
+        if self.index_type == 'ivf' and len(rows) >= config.FAISS_IVF_NLIST * config.FAISS_IVF_MIN_POINTS_PER_LIST:
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            base = faiss.IndexIVFFlat(quantizer, self.dimension, config.FAISS_IVF_NLIST, faiss.METRIC_INNER_PRODUCT)
+            base.train(vectors)
+            index = base  # IVF stores external ids itself and supports removal by id
+        else:
+            index = self._new_index()
+        if len(rows):
+            index.add_with_ids(vectors, ids)
+        self.index = self._configure_search(index)
+        self._tombstones = 0
+        self._dirty = True
+
+    def _load(self):
+        """Load the persisted index, rebuilding it if missing or out of date."""
+        if self.index_path.exists():
+            self.index = self._configure_search(faiss.read_index(str(self.index_path)))
+            self._tombstones = self.index.ntotal - self._count()
+            # Only HNSW keeps removed vectors around; anything else means the
+            # index file missed a write and must be rebuilt from SQLite
+            if self._tombstones < 0 or (self._tombstones and self.index_type != 'hnsw'):
+                self._rebuild()
+        else:
+            self._rebuild()
+        self._loaded_mtime = self._index_mtime()
+
+    def _index_mtime(self) -> Optional[int]:
+        return self.index_path.stat().st_mtime_ns if self.index_path.exists() else None
+
+    def _reload_if_stale(self):
+        """Pick up writes made by another process since the index was loaded."""
+        if self._index_mtime() != self._loaded_mtime:
+            self._load()
+
+    def _needs_rebuild(self) -> bool:
+        ntotal = self.index.ntotal
+        if self._tombstones > config.FAISS_MAX_TOMBSTONE_RATIO * max(ntotal, 1):
+            return True
+        is_trained_ivf = isinstance(self._base_index(self.index), faiss.IndexIVF)
+        return (self.index_type == 'ivf' and not is_trained_ivf
+                and ntotal >= config.FAISS_IVF_NLIST * config.FAISS_IVF_MIN_POINTS_PER_LIST)
+
+    def _remove(self, int_ids: List[int]):
+        """Remove ids from the index; HNSW cannot remove, so those become tombstones."""
+        if not int_ids:
+            return
+        if self.index_type == 'hnsw':
+            self._tombstones += len(int_ids)
+        else:
+            self.index.remove_ids(np.array(int_ids, dtype=np.int64))
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, chunk_ids: List[str]) -> List[int]:
+        """Delete rows for chunk IDs and return their int ids."""
+        removed = []
+        for batch, placeholders in in_batches(chunk_ids):
+            removed.extend(row[0] for row in conn.execute(
+                f"SELECT int_id FROM vectors WHERE chunk_id IN ({placeholders})", batch
+            ))
+            conn.execute(f"DELETE FROM vectors WHERE chunk_id IN ({placeholders})", batch)
+        return removed
+
+    def upsert(self, vectors: List[Dict]):
+        with self._write_lock():
+            self._reload_if_stale()
+            embeddings = np.asarray([vector['values'] for vector in vectors], dtype=np.float32)
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                replaced = self._delete_rows(conn, [vector['id'] for vector in vectors])
+                int_ids = []
+                for vector, embedding in zip(vectors, embeddings):
+                    cursor = conn.execute(
+                        "INSERT INTO vectors (chunk_id, embedding, metadata) VALUES (?, ?, ?)",
+                        (vector['id'], embedding.tobytes(), json.dumps(vector['metadata'], default=str))
+                    )
+                    int_ids.append(cursor.lastrowid)
+                conn.execute("COMMIT")
+
+            self._remove(replaced)
+            self.index.add_with_ids(embeddings, np.array(int_ids, dtype=np.int64))
+            if self._needs_rebuild():
+                self._rebuild()
+            self._dirty = True
+
+    def delete(self, ids: List[str]):
+        with self._write_lock():
+            self._reload_if_stale()
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                removed = self._delete_rows(conn, ids)
+                conn.execute("COMMIT")
+
+            self._remove(removed)
+            if self._needs_rebuild():
+                self._rebuild()
+            self._dirty = True
+
+    def _write(self):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        faiss.write_index(self.index, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+        self._loaded_mtime = self._index_mtime()
+        self._dirty = False
+
+    def query(self, embedding: List[float], k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        with self._lock:
+            self._reload_if_stale()
+            query = np.asarray([embedding], dtype=np.float32)
+            # Over-fetch so HNSW tombstones and metadata filters do not leave us short of k results
+            fetch_k = k * config.FAISS_FILTER_OVERFETCH if filters else k
+            if self.index_type == 'hnsw':
+                fetch_k += min(self._tombstones, k * 4)
+            scores, int_ids = self.index.search(query, fetch_k)
+
+        hits = [(int(int_id), float(score)) for int_id, score in zip(int_ids[0], scores[0]) if int_id != -1]
+        if not hits:
+            return []
+        with self._connect() as conn:
+            placeholders = ",".join("?" * len(hits))
+            rows = {
+                row[0]: (row[1], row[2]) for row in conn.execute(
+                    f"SELECT int_id, chunk_id, metadata FROM vectors WHERE int_id IN ({placeholders})",
+                    [int_id for int_id, _ in hits]
+                )
+            }
+
+        matches = []
+        for int_id, score in hits:
+            if int_id in rows:
+                chunk_id, metadata = rows[int_id]
+                metadata = json.loads(metadata)
+                if not filters or matches_filters(metadata, filters):
+                    matches.append({'id': chunk_id, 'score': score, 'metadata': metadata})
+        return matches[:k]
+
+    def fetch(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors by ID; IDs not in the index are left out."""
+        vectors = {}
+        with self._connect() as conn:
+            for batch, placeholders in in_batches(ids):
+                for chunk_id, embedding in conn.execute(
+                    f"SELECT chunk_id, embedding FROM vectors WHERE chunk_id IN ({placeholders})", batch
+                ):
+                    vectors[chunk_id] = np.frombuffer(embedding, dtype=np.float32).tolist()
+        return vectors
+
+    def flush(self):
+        """Write the index to disk if it changed since the last flush."""
+        with self._write_lock():
+            if self._dirty:
+                self._write()
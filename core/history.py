@@ -0,0 +1,91 @@
+# core/history.py
+from typing import Callable, Dict, List, Optional
+from utils.config import config
+from utils.helpers import format_chat_history
+from core.context_packer import TokenCounter
+
+SUMMARY_PREFIX = "Summary of earlier conversation: "
+
+
+class ConversationMemory:
+    """Per-session chat history kept within a fixed token budget.
+
+    Each message is formatted and token-counted once when added, line breaks
+    and the summary prefix included, so `format()` never exceeds the budget.
+    The most recent messages are kept verbatim; once they exceed the budget,
+    the oldest are folded into a rolling summary capped at half the budget.
+    Folding evicts messages down to half of what the summary may leave, so
+    the summarizer runs every few turns rather than on each one, and the
+    summary is reused until the next fold. A latest message that alone
+    exceeds what the summary leaves is cut at a sentence boundary.
+    """
+    def __init__(
+        self,
+        summarizer: Optional[Callable[[str, str], str]] = None,
+        token_budget: int = config.HISTORY_TOKEN_BUDGET,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.counter = counter or TokenCounter()
+        self.messages: List[Dict] = []  # Recent messages kept verbatim
+        self.window_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def _message(self, role: str, content: str) -> Dict:
+        line = format_chat_history([{"role": role, "content": content}])
+        return {"role": role, "content": content, "line": line, "tokens": self.counter.count(line + "\n")}
+
+    def add(self, role: str, content: str):
+        message = self._message(role, content)
+        self.messages.append(message)
+        self.window_tokens += message['tokens']
+        if self.window_tokens + self.summary_tokens > self.token_budget:
+            self._fold()
+
+    @property
+    def summary_budget(self) -> int:
+        return self.token_budget // 2
+
+    def _set_summary(self, summary: str):
+        """Keep the summary, with its prefix line, within half the budget."""
+        overhead = self.counter.count(SUMMARY_PREFIX + "\n")
+        self.summary = self.counter.truncate(summary, max(self.summary_budget - overhead, 0))
+        self.summary_tokens = self.counter.count(f"{SUMMARY_PREFIX}{self.summary}\n") if self.summary else 0
+
+    def _fold(self):
+        """Fold the oldest messages into the summary, freeing half of the non-summary budget."""
+        target = (self.token_budget - self.summary_budget) // 2
+        evicted = []
+        # The latest message is never folded into the summary
+        while len(self.messages) > 1 and self.window_tokens > target:
+            message = self.messages.pop(0)
+            self.window_tokens -= message['tokens']
+            evicted.append(message['line'])
+        if evicted and self.summarizer is not None:
+            self._set_summary(self.summarizer(self.summary, "\n".join(evicted)))
+        # Without a summarizer the evicted turns are simply dropped
+        if self.window_tokens + self.summary_tokens > self.token_budget:
+            self._truncate_latest(self.token_budget - self.summary_tokens)
+
+    def _truncate_latest(self, max_tokens: int):
+        """Cut the only remaining message to max_tokens, including its role prefix."""
+        latest = self.messages[-1]
+        overhead = self._message(latest['role'], "")['tokens']
+        content = self.counter.truncate(latest['content'], max(max_tokens - overhead, 0))
+        self.messages[-1] = self._message(latest['role'], content)
+        self.window_tokens = self.messages[-1]['tokens']
+
+    def format(self) -> str:
+        """History block for the prompt: the summary followed by recent messages."""
+        lines = [message['line'] for message in self.messages]
+        if self.summary:
+            lines.insert(0, f"{SUMMARY_PREFIX}{self.summary}")
+        return "\n".join(lines)
+
+    def clear(self):
+        self.messages = []
+        self.window_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
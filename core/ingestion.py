@@ -0,0 +1,204 @@
+# core/ingestion.py
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from utils.config import config
+from utils.helpers import hash_file
+from utils.metrics import metrics
+from core.document_processor import EnhancedDocumentProcessor
+from core.embeddings import EmbeddingManager
+from core.vector_store import VectorStore
+from core.ingestion_manifest import IngestionManifest
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most `size` items without materializing it."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+_DONE = object()
+
+
+def _timed(items: Iterable, stage: str) -> Iterator:
+    """Record the time spent waiting for each item of an iterator as `stage`."""
+    iterator = iter(items)
+    while True:
+        with metrics.span(stage):
+            item = next(iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+class DocumentIngestor:
+    """Indexes files incrementally using the ingestion manifest.
+
+    Unchanged files are skipped without parsing, and only changed pages of a
+    modified file are chunked, embedded and upserted. Pages are streamed in
+    batches, so memory does not grow with document length. Vectors that no
+    page produces any more are deleted from the vector store. The manifest
+    may be shared with other worker processes.
+    """
+    def __init__(
+        self,
+        doc_processor: EnhancedDocumentProcessor,
+        embedding_manager: EmbeddingManager,
+        vector_store: VectorStore,
+        manifest: IngestionManifest = None
+    ):
+        self.doc_processor = doc_processor
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.manifest = manifest or IngestionManifest()
+
+    def _embed_chunks(self, chunks: List[Dict]) -> List[List[float]]:
+        """Embeddings for chunks, reusing the ones computed while chunking."""
+        missing = [i for i, chunk in enumerate(chunks) if chunk.get('embedding') is None]
+        with metrics.span("ingest_embed"):
+            new_embeddings = self.embedding_manager.generate_embeddings(
+                [chunks[i]['text'] for i in missing]
+            ) if missing else []
+        embeddings = [chunk.get('embedding') for chunk in chunks]
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
+        return embeddings
+
+    def _delete_stale(self, previous_ids: set) -> int:
+        """Delete previously indexed chunk IDs that no page references any more.
+
+        Must run inside a manifest transaction so no other writer can start
+        referencing an ID between the check and the delete.
+        """
+        stale_ids = previous_ids - self.manifest.referenced_chunk_ids(previous_ids)
+        if stale_ids:
+            self.vector_store.delete_documents(list(stale_ids))
+        return len(stale_ids)
+
+    def _prepare_batch(self, source: str, file_path: Path, total_pages: int, page_batch: List[Dict]) -> Dict:
+        """Chunk and embed the changed pages of a batch."""
+        page_hashes = {page['page_num']: self.doc_processor.page_hash(page) for page in page_batch}
+        changed = self.manifest.changed_pages(source, page_hashes)
+        with metrics.span("ingest_chunk"):
+            chunks = self.doc_processor.chunk_pages(
+                file_path, total_pages, [page for page in page_batch if page['page_num'] in changed]
+            ) if changed else []
+
+        page_ids = {page_num: [] for page_num in changed}
+        for chunk in chunks:
+            page_ids[chunk['metadata']['page_num']].append(chunk['metadata']['chunk_id'])
+        return {
+            'page_hashes': page_hashes,
+            'page_ids': page_ids,
+            'chunks': chunks,
+            'embeddings': self._embed_chunks(chunks) if chunks else []
+        }
+
+    def _submit_batch(self, source: str, batch: Dict, upserter: ThreadPoolExecutor) -> Optional[Future]:
+        """Record the batch's pages as pending, then start upserting its vectors."""
+        if batch['page_ids']:
+            with self.manifest.transaction():
+                for page_num, chunk_ids in batch['page_ids'].items():
+                    self.manifest.record_page(source, page_num, batch['page_hashes'][page_num], chunk_ids, pending=True)
+        if not batch['chunks']:
+            return None
+        # Run in this context, so the upsert's timing is attributed to the profiled job
+        return upserter.submit(contextvars.copy_context().run, self._upsert, batch['chunks'], batch['embeddings'])
+
+    def _upsert(self, chunks: List[Dict], embeddings: List[List[float]]):
+        with metrics.span("ingest_upsert"):
+            self.vector_store.add_documents(chunks, embeddings)
+
+    def _commit_batch(self, source: str, batch: Dict, upsert: Optional[Future], stats: Dict,
+                      progress_callback: Optional[Callable[[Dict], None]]):
+        """Wait for the batch's upsert, then checkpoint it and drop vectors it replaced."""
+        if upsert is not None:
+            upsert.result()
+        if batch['page_ids']:
+            with self.manifest.transaction():
+                previous_ids = self.manifest.page_chunk_ids(source, batch['page_ids'])
+                self.manifest.commit_pages(source, batch['page_ids'])
+                stats['chunks_deleted'] += self._delete_stale(previous_ids)
+
+        stats['pages_done'] += len(batch['page_hashes'])
+        stats['changed_pages'] += len(batch['page_ids'])
+        stats['chunks_upserted'] += len(batch['chunks'])
+        if progress_callback:
+            progress_callback(dict(stats))
+
+    def ingest_file(
+        self,
+        file_path: Path,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Index `file_path`, touching only what changed since the last run.
+
+        Extraction, chunking/embedding and upserting run as overlapping stages:
+        while one batch is being upserted the next one is chunked and embedded,
+        and the extraction pool is already working on the pages after that.
+        Every batch is checkpointed in the manifest once its upsert succeeds,
+        so an interrupted run resumes at the first uncommitted batch.
+        """
+        if file_path.suffix.lower() != '.pdf':
+            raise ValueError(f"Unsupported file type: {file_path.suffix}")
+
+        source = file_path.name
+        file_hash = hash_file(file_path)
+        if self.manifest.is_unchanged(source, file_hash):
+            return {'source': source, 'status': 'unchanged', 'total_pages': None, 'pages_done': 0,
+                    'changed_pages': 0, 'chunks_upserted': 0, 'chunks_deleted': 0}
+
+        total_pages = self.doc_processor.count_pages(file_path)
+        stats = {'source': source, 'status': 'indexed', 'total_pages': total_pages, 'pages_done': 0,
+                 'changed_pages': 0, 'chunks_upserted': 0, 'chunks_deleted': 0}
+        seen_pages = set()
+
+        in_flight = None
+        with ThreadPoolExecutor(max_workers=1) as upserter:
+            pages = self.doc_processor.iter_pages(file_path, total_pages)
+            for page_batch in _timed(_batched(pages, config.INGEST_PAGE_BATCH), "ingest_parse"):
+                batch = self._prepare_batch(source, file_path, total_pages, page_batch)
+                seen_pages.update(batch['page_hashes'])
+                if in_flight:
+                    self._commit_batch(source, *in_flight, stats, progress_callback)
+                in_flight = (batch, self._submit_batch(source, batch, upserter))
+            if in_flight:
+                self._commit_batch(source, *in_flight, stats, progress_callback)
+
+        with self.manifest.transaction():
+            removed = self.manifest.removed_pages(source, seen_pages)
+            previous_ids = self.manifest.page_chunk_ids(source, removed)
+            for page_num in removed:
+                self.manifest.remove_page(source, page_num)
+            stats['chunks_deleted'] += self._delete_stale(previous_ids)
+            self.manifest.mark_complete(source, file_hash, total_pages)
+        return stats
+
+    def remove_source(self, source: str) -> Dict:
+        """Forget a source file, deleting the chunks no other page still references."""
+        with self.manifest.transaction():
+            previous_ids = self.manifest.page_chunk_ids(source, self.manifest.removed_pages(source, []))
+            self.manifest.remove_file(source)
+            chunks_deleted = self._delete_stale(previous_ids)
+        return {'source': source, 'status': 'removed', 'total_pages': None, 'pages_done': 0,
+                'changed_pages': 0, 'chunks_upserted': 0, 'chunks_deleted': chunks_deleted}
+
+    def ingest_directory(self, directory: Path, prune: bool = True) -> List[Dict]:
+        """Sync every PDF under `directory`; unchanged files cost one hash each.
+
+        With `prune`, the directory is taken to be the whole corpus: sources
+        recorded in the manifest whose file is gone (deleted or renamed) are
+        removed along with their vectors.
+        """
+        paths = sorted(Path(directory).glob("*.pdf"))
+        results = [self.ingest_file(path) for path in paths]
+        if prune:
+            present = {path.name for path in paths}
+            results.extend(self.remove_source(source) for source in sorted(self.manifest.sources() - present))
+        return results
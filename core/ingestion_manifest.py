@@ -0,0 +1,223 @@
+# core/ingestion_manifest.py
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from utils.config import config
+from utils.storage import in_batches
+
+
+class IngestionManifest:
+    """Persistent record of what has been indexed for every source file.
+
+    For each file it keeps the file content hash and, per page, the page
+    content hash plus the chunk IDs that page produced. Stored in SQLite with
+    an index from chunk ID to the pages referencing it, so every operation
+    touches only the rows of the pages involved. Several worker processes may
+    share one manifest; they must modify it inside `transaction()`.
+
+    Each vector index has its own manifest (by default in the index's state
+    directory), so switching backends re-indexes files into the new index.
+    """
+    def __init__(self, path: Optional[Path] = None):
+        legacy_path = self._legacy_json_path() if path is None else Path(path).with_suffix(".json")
+        self.path = Path(path) if path is not None else config.index_state_dir() / "ingestion_manifest.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS files (
+                    source TEXT PRIMARY KEY, file_hash TEXT, total_pages INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    source TEXT NOT NULL, page_num INTEGER NOT NULL, hash TEXT NOT NULL,
+                    pending INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (source, page_num)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS page_chunks (
+                    source TEXT NOT NULL, page_num INTEGER NOT NULL, chunk_id TEXT NOT NULL,
+                    previous INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (source, page_num, previous, chunk_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS page_chunks_chunk ON page_chunks (chunk_id, previous);
+            """)
+        self._import_json(legacy_path)
+
+    @staticmethod
+    def _legacy_json_path() -> Path:
+        """The JSON manifest used to be shared at DB_DIR and only ever described the Pinecone index."""
+        if config.VECTOR_BACKEND == "pinecone":
+            return config.DB_DIR / "ingestion_manifest.json"
+        return config.index_state_dir() / "ingestion_manifest.json"
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """The open transaction's connection on this thread, or a new autocommit one."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _import_json(self, json_path: Path):
+        """One-time migration from the JSON manifest used by earlier versions."""
+        if not json_path.exists():
+            return
+        with self.transaction():
+            if not json_path.exists():  # Another worker migrated it first
+                return
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for source, entry in data.get('files', {}).items():
+                with self._connect() as conn:
+                    conn.execute("INSERT OR IGNORE INTO files (source, file_hash, total_pages) VALUES (?, ?, ?)",
+                                 (source, entry.get('file_hash'), entry.get('total_pages')))
+                for page_num, page in entry.get('pages', {}).items():
+                    self._write_page(source, int(page_num), page['hash'], page['chunk_ids'],
+                                     page.get('previous_chunk_ids', []), page.get('pending', False))
+            json_path.rename(json_path.with_suffix(".json.migrated"))
+
+    @contextmanager
+    def transaction(self):
+        """Modify the manifest atomically while holding SQLite's cross-process write lock."""
+        if getattr(self._local, 'conn', None) is not None:
+            yield self  # Nested: part of the enclosing transaction
+            return
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.conn = conn
+        try:
+            yield self
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.conn = None
+            conn.close()
+
+    def get_file(self, source: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT file_hash, total_pages FROM files WHERE source = ?", (source,)).fetchone()
+        return {'file_hash': row[0], 'total_pages': row[1]} if row else None
+
+    def sources(self) -> Set[str]:
+        """Every source file with recorded pages or a recorded hash."""
+        with self._connect() as conn:
+            return {source for (source,) in conn.execute("SELECT source FROM files UNION SELECT source FROM pages")}
+
+    def is_unchanged(self, source: str, file_hash: str) -> bool:
+        """True if `source` was fully indexed with exactly this content."""
+        entry = self.get_file(source)
+        return entry is not None and entry.get('file_hash') == file_hash
+
+    def changed_pages(self, source: str, page_hashes: Dict[int, str]) -> Set[int]:
+        """Pages whose hash is new, differs from the recorded one, or was never committed."""
+        recorded = {}
+        with self._connect() as conn:
+            for batch, placeholders in in_batches(list(page_hashes)):
+                recorded.update(
+                    (page_num, (page_hash, pending)) for page_num, page_hash, pending in conn.execute(
+                        f"SELECT page_num, hash, pending FROM pages WHERE source = ? AND page_num IN ({placeholders})",
+                        [source, *batch]
+                    )
+                )
+        return {
+            page_num for page_num, page_hash in page_hashes.items()
+            if recorded.get(page_num, (None, 0))[0] != page_hash or recorded[page_num][1]
+        }
+
+    def removed_pages(self, source: str, page_nums: Iterable[int]) -> Set[int]:
+        """Recorded pages that no longer exist in the new version of the file."""
+        with self._connect() as conn:
+            recorded = {page_num for (page_num,) in conn.execute("SELECT page_num FROM pages WHERE source = ?", (source,))}
+        return recorded - set(page_nums)
+
+    def page_chunk_ids(self, source: str, page_nums: Iterable[int]) -> Set[str]:
+        """Current and not yet cleaned-up previous chunk IDs of the given pages."""
+        chunk_ids = set()
+        with self._connect() as conn:
+            for batch, placeholders in in_batches(list(page_nums)):
+                chunk_ids.update(chunk_id for (chunk_id,) in conn.execute(
+                    f"SELECT chunk_id FROM page_chunks WHERE source = ? AND page_num IN ({placeholders})",
+                    [source, *batch]
+                ))
+        return chunk_ids
+
+    def _write_page(self, source: str, page_num: int, page_hash: str, chunk_ids: Iterable[str],
+                    previous_chunk_ids: Iterable[str], pending: bool):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pages (source, page_num, hash, pending) VALUES (?, ?, ?, ?)",
+                         (source, page_num, page_hash, int(pending)))
+            conn.execute("DELETE FROM page_chunks WHERE source = ? AND page_num = ?", (source, page_num))
+            conn.executemany(
+                "INSERT OR IGNORE INTO page_chunks (source, page_num, chunk_id, previous) VALUES (?, ?, ?, ?)",
+                [(source, page_num, chunk_id, 0) for chunk_id in chunk_ids]
+                + [(source, page_num, chunk_id, 1) for chunk_id in previous_chunk_ids]
+            )
+
+    def record_page(self, source: str, page_num: int, page_hash: str, chunk_ids: List[str], pending: bool = False):
+        """Record the chunk IDs of a page.
+
+        Pages are recorded as pending before their vectors are upserted, so
+        other writers see the IDs as referenced and never delete them. A
+        pending page remembers the IDs it replaced until it is committed, so
+        an interrupted run can still clean them up.
+        """
+        with self.transaction():
+            previous = self.page_chunk_ids(source, [page_num]) if pending else set()
+            self._write_page(source, page_num, page_hash, chunk_ids, previous, pending)
+
+    def commit_pages(self, source: str, page_nums: Iterable[int]):
+        """Mark pending pages as fully indexed."""
+        with self.transaction(), self._connect() as conn:
+            for batch, placeholders in in_batches(list(page_nums)):
+                conn.execute(f"UPDATE pages SET pending = 0 WHERE source = ? AND page_num IN ({placeholders})",
+                             [source, *batch])
+                conn.execute(
+                    f"DELETE FROM page_chunks WHERE source = ? AND previous = 1 AND page_num IN ({placeholders})",
+                    [source, *batch]
+                )
+
+    def remove_page(self, source: str, page_num: int):
+        with self.transaction(), self._connect() as conn:
+            conn.execute("DELETE FROM pages WHERE source = ? AND page_num = ?", (source, page_num))
+            conn.execute("DELETE FROM page_chunks WHERE source = ? AND page_num = ?", (source, page_num))
+
+    def remove_file(self, source: str):
+        """Forget a source file and all of its pages."""
+        with self.transaction(), self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE source = ?", (source,))
+            conn.execute("DELETE FROM pages WHERE source = ?", (source,))
+            conn.execute("DELETE FROM page_chunks WHERE source = ?", (source,))
+
+    def mark_complete(self, source: str, file_hash: str, total_pages: int):
+        """Record the file hash once every page of this version is indexed."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO files (source, file_hash, total_pages) VALUES (?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET file_hash = excluded.file_hash, total_pages = excluded.total_pages",
+                (source, file_hash, total_pages)
+            )
+
+    def referenced_chunk_ids(self, chunk_ids: Iterable[str]) -> Set[str]:
+        """Those of `chunk_ids` still produced by some page of some file.
+
+        Chunk IDs are content hashes, so identical text on two pages shares
+        one vector; it may only be deleted when no page references it.
+        """
+        referenced = set()
+        with self._connect() as conn:
+            for batch, placeholders in in_batches(list(chunk_ids)):
+                referenced.update(chunk_id for (chunk_id,) in conn.execute(
+                    f"SELECT DISTINCT chunk_id FROM page_chunks WHERE previous = 0 AND chunk_id IN ({placeholders})",
+                    batch
+                ))
+        return referenced
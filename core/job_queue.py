@@ -0,0 +1,214 @@
+# core/job_queue.py
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from utils.config import config
+from utils.profiling import profiled
+from core.document_processor import EnhancedDocumentProcessor
+from core.embeddings import EmbeddingManager
+from core.vector_store import VectorStore
+from core.ingestion import DocumentIngestor
+from core.registry import warm_up
+
+
+class JobQueue:
+    """Persistent ingestion job queue backed by SQLite.
+
+    Jobs survive restarts of the Streamlit server and of the workers. A job
+    whose worker stopped sending heartbeats is handed to another worker,
+    which resumes it from the ingestion manifest checkpoints.
+    """
+    def __init__(self, path: Path = config.DB_DIR / "ingestion_jobs.sqlite3"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_path TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    total_pages INTEGER,
+                    pages_done INTEGER NOT NULL DEFAULT 0,
+                    changed_pages INTEGER NOT NULL DEFAULT 0,
+                    chunks_upserted INTEGER NOT NULL DEFAULT 0,
+                    chunks_deleted INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL,
+                    finished_at REAL,
+                    profile INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'profile' not in columns:  # Queues created before per-job profiling
+                conn.execute("ALTER TABLE jobs ADD COLUMN profile INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, file_path: Path, profile: bool = False) -> int:
+        """Add a file to the queue and return the job ID; `profile` captures a profile of the run."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (file_path, source, created_at, profile) VALUES (?, ?, ?, ?)",
+                (str(file_path), Path(file_path).name, time.time(), int(profile))
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Atomically take the oldest runnable job.
+
+        Queued jobs and running jobs with a stale heartbeat are runnable, but
+        never a job whose source file is already being processed elsewhere.
+        """
+        stale_before = time.time() - config.JOB_HEARTBEAT_TIMEOUT
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("""
+                    SELECT * FROM jobs AS j
+                    WHERE (j.status = 'queued' OR (j.status = 'running' AND j.updated_at < :stale))
+                      AND NOT EXISTS (
+                          SELECT 1 FROM jobs AS other
+                          WHERE other.source = j.source AND other.id != j.id
+                            AND other.status = 'running' AND other.updated_at >= :stale
+                      )
+                    ORDER BY j.id LIMIT 1
+                """, {'stale': stale_before}).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute("""
+                        UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                            started_at = COALESCE(started_at, ?), updated_at = ?
+                        WHERE id = ?
+                    """, (worker, now, now, row['id']))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def update_progress(self, job_id: int, stats: Dict):
+        """Checkpoint progress; also serves as the worker heartbeat."""
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET total_pages = ?, pages_done = ?, changed_pages = ?,
+                    chunks_upserted = ?, chunks_deleted = ?, updated_at = ?
+                WHERE id = ?
+            """, (stats.get('total_pages'), stats['pages_done'], stats['changed_pages'],
+                  stats['chunks_upserted'], stats['chunks_deleted'], time.time(), job_id))
+
+    def complete(self, job_id: int, stats: Dict):
+        self.update_progress(job_id, stats)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, finished_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def fail(self, job_id: int, error: str):
+        """Requeue the job, or mark it failed once it ran out of attempts."""
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+                    finished_at = CASE WHEN attempts >= :max_attempts THEN :now ELSE NULL END,
+                    error = :error, updated_at = :now
+                WHERE id = :id
+            """, {'max_attempts': config.JOB_MAX_ATTEMPTS, 'error': error, 'now': time.time(), 'id': job_id})
+
+    def list_jobs(self, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, with throughput in pages per second."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            elapsed = (job['finished_at'] or job['updated_at'] or 0) - (job['started_at'] or 0)
+            job['pages_per_second'] = job['pages_done'] / elapsed if job['started_at'] and elapsed > 0 else 0.0
+            jobs.append(job)
+        return jobs
+
+    def has_active_jobs(self) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()
+        return row[0] > 0
+
+
+def run_worker(poll_interval: float = config.JOB_POLL_INTERVAL, exit_when_idle: bool = False):
+    """Claim and run ingestion jobs until stopped (or until the queue is empty)."""
+    config.ensure_directories()
+    warm_up()
+    queue = JobQueue()
+    ingestor = DocumentIngestor(EnhancedDocumentProcessor(), EmbeddingManager(), VectorStore())
+    worker = f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}:{os.getpid()}"
+
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            if exit_when_idle:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            with profiled(f"ingest-{job['source']}", requested=bool(job['profile']), metadata={'job_id': job['id']}):
+                stats = ingestor.ingest_file(
+                    Path(job['file_path']),
+                    progress_callback=lambda stats: queue.update_progress(job['id'], stats)
+                )
+            queue.complete(job['id'], stats)
+        except Exception:
+            queue.fail(job['id'], traceback.format_exc())
+
+
+def start_workers(count: int = config.INGEST_WORKERS) -> List[multiprocessing.Process]:
+    """Start worker processes that drain the queue and then exit.
+
+    Workers are spawned, so they load their own models, and are not daemonic
+    because they run their own page extraction pool.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(count):
+        process = context.Process(target=run_worker, kwargs={'exit_when_idle': True})
+        process.start()
+        workers.append(process)
+    return workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingestion queue workers.")
+    parser.add_argument("--workers", type=int, default=config.INGEST_WORKERS)
+    parser.add_argument("--exit-when-idle", action="store_true")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker(exit_when_idle=args.exit_when_idle)
+    else:
+        processes = [
+            multiprocessing.Process(target=run_worker, kwargs={'exit_when_idle': args.exit_when_idle})
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
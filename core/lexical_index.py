@@ -0,0 +1,219 @@
+# core/lexical_index.py
+import heapq
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from utils.config import config
+from core.registry import registry
+from core.vector_backends import matches_filters
+
+# Very common words carry no ranking signal but have the longest postings lists
+STOPWORDS = frozenset("""
+a an and are as at be by can do for from has have i if in is it its me my no not of on or
+our so that the their them there these they this to was we were what when which who will
+with you your
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_/.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; codes such as '6E-2134' are kept whole and also split."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-_/.]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+class InvertedIndex:
+    """Persistent BM25 index built on postings lists.
+
+    Postings, document frequencies and corpus statistics live in SQLite and
+    are updated incrementally as documents are added or deleted. A query only
+    touches the postings of its own terms instead of scoring every document.
+    Each vector index has its own lexical index (by default in the index's
+    state directory), so BM25 only returns chunks the active index holds.
+    """
+    def __init__(self, path: Optional[Path] = None, k1: float = config.BM25_K1, b: float = config.BM25_B):
+        self.path = Path(path) if path is not None else config.index_state_dir() / "lexical_index.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+        self._idf_cache: Dict[str, float] = {}
+        self._idf_version = None
+        self._idf_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, doc_length INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO stats (name, value) VALUES ('doc_count', 0), ('total_length', 0), ('version', 0);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread, so retrieval can run on executor threads."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'version'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _remove(self, conn: sqlite3.Connection, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            row = conn.execute("SELECT length FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            terms = [term for (term,) in conn.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,))]
+            conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", [(term,) for term in terms])
+            conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+            conn.execute("UPDATE stats SET value = value - 1 WHERE name = 'doc_count'")
+            conn.execute("UPDATE stats SET value = value - ? WHERE name = 'total_length'", (row[0],))
+        conn.execute("DELETE FROM terms WHERE df <= 0")
+
+    def add_documents(self, documents: List[Dict]):
+        """Index (or re-index) documents with 'text' and 'metadata' containing 'chunk_id'."""
+        with self._transaction() as conn:
+            self._remove(conn, [doc['metadata']['chunk_id'] for doc in documents])
+            for doc in documents:
+                doc_id = doc['metadata']['chunk_id']
+                term_counts = Counter(tokenize(doc['text']))
+                length = sum(term_counts.values())
+                conn.execute(
+                    "INSERT OR REPLACE INTO docs (doc_id, length, text, metadata) VALUES (?, ?, ?, ?)",
+                    (doc_id, length, doc['text'], json.dumps(doc['metadata'], default=str))
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO postings (term, doc_id, tf, doc_length) VALUES (?, ?, ?, ?)",
+                    [(term, doc_id, tf, length) for term, tf in term_counts.items()]
+                )
+                conn.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(term,) for term in term_counts]
+                )
+                conn.execute("UPDATE stats SET value = value + 1 WHERE name = 'doc_count'")
+                conn.execute("UPDATE stats SET value = value + ? WHERE name = 'total_length'", (length,))
+
+    def delete_documents(self, doc_ids: List[str]):
+        with self._transaction() as conn:
+            self._remove(conn, doc_ids)
+
+    def _stats(self) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT name, value FROM stats"))
+
+    def _idf(self, terms: List[str], doc_count: int, version: int) -> Dict[str, float]:
+        """BM25 IDF per term, cached until the index changes.
+
+        Each call builds its own dict, so a concurrent query that swaps the
+        cache for a newer index version cannot take terms away from this one.
+        """
+        with self._idf_lock:
+            if version != self._idf_version:
+                self._idf_cache = {}
+                self._idf_version = version
+            cache = self._idf_cache
+        idf = {term: cache[term] for term in terms if term in cache}
+        missing = [term for term in terms if term not in idf]
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            df = dict(self._conn().execute(
+                f"SELECT term, df FROM terms WHERE term IN ({placeholders})", missing
+            ))
+            for term in missing:
+                n = df.get(term, 0)
+                idf[term] = math.log((doc_count - n + 0.5) / (n + 0.5) + 1) if n else 0.0
+            with self._idf_lock:
+                cache.update((term, idf[term]) for term in missing)
+        return idf
+
+    def search(self, query: str, k: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """Top-k documents by BM25 score, in the same shape as VectorStore.search."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        conn = self._conn()
+        # One read transaction: statistics, postings and documents come from the
+        # same snapshot, even while another thread or process writes
+        conn.execute("BEGIN")
+        try:
+            return self._search(conn, terms, k, filters)
+        finally:
+            conn.execute("COMMIT")
+
+    def _search(self, conn: sqlite3.Connection, terms: List[str], k: int, filters: Optional[Dict]) -> List[Dict]:
+        stats = self._stats()
+        if not stats['doc_count']:
+            return []
+        avg_length = stats['total_length'] / stats['doc_count']
+        idf = self._idf(terms, stats['doc_count'], stats['version'])
+
+        scores: Dict[str, float] = {}
+        for term in terms:
+            if not idf[term]:
+                continue
+            for doc_id, tf, doc_length in conn.execute(
+                "SELECT doc_id, tf, doc_length FROM postings WHERE term = ?", (term,)
+            ):
+                norm = self.k1 * (1 - self.b + self.b * doc_length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+        fetch_k = k * config.FAISS_FILTER_OVERFETCH if filters else k
+        top = heapq.nlargest(fetch_k, scores.items(), key=lambda item: item[1])
+        if not top:
+            return []
+        placeholders = ",".join("?" * len(top))
+        rows = {
+            doc_id: (text, json.loads(metadata)) for doc_id, text, metadata in conn.execute(
+                f"SELECT doc_id, text, metadata FROM docs WHERE doc_id IN ({placeholders})",
+                [doc_id for doc_id, _ in top]
+            )
+        }
+
+        results = []
+        for doc_id, score in top:
+            if doc_id not in rows:
+                continue
+            text, metadata = rows[doc_id]
+            if filters and not matches_filters(metadata, filters):
+                continue
+            results.append({'text': text, 'metadata': metadata, 'bm25_score': score})
+        return results[:k]
+
+
+def get_lexical_index() -> InvertedIndex:
+    """Shared lexical index of the active vector index."""
+    path = config.index_state_dir() / "lexical_index.sqlite3"
+    return registry.get(f"lexical_index:{path}", lambda: InvertedIndex(path))
@@ -1,30 +1,124 @@
 # core/llm.py
-from typing import List, Dict, Optional, Generator
-from langchain_community.chat_models import ChatOpenAI
+import asyncio
+import re
+import threading
+import time
+import weakref
+from typing import List, Dict, Optional, Generator, Union, AsyncIterator, Tuple
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
 from langchain.callbacks.base import BaseCallbackHandler
 from utils.config import config
+from utils.metrics import metrics
 from utils.helpers import format_chat_history
+from core.context_packer import ContextPacker
+from core.history import ConversationMemory
+from core.registry import get_http_client
 
 class StreamHandler(BaseCallbackHandler):
-    def __init__(self, container):
-        self.container = container
-        self.text = ""
-        
+    """Renders streamed tokens into a Streamlit container in coalesced updates.
+
+    Tokens are buffered and the container is redrawn at most every
+    STREAM_FLUSH_INTERVAL seconds or STREAM_FLUSH_CHARS characters, and once
+    more when the answer ends. Completed paragraphs are written once into
+    their own element and never resent, so each redraw only carries the
+    paragraph still being written.
+    """
+    def __init__(
+        self,
+        container,
+        flush_interval: float = config.STREAM_FLUSH_INTERVAL,
+        flush_chars: int = config.STREAM_FLUSH_CHARS
+    ):
+        self.body = container.container()
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.tokens: List[str] = []
+        self.paragraph: List[str] = []  # Tokens since the last frozen paragraph
+        self.placeholder = self.body.empty()
+        self.pending_chars = 0
+        self.pending_newline = False
+        self.last_flush = time.monotonic()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.tokens)
+
+    def _freeze_paragraphs(self):
+        """Write finished paragraphs into the current element and start a new one."""
+        text = "".join(self.paragraph)
+        boundary = text.rfind("\n\n")
+        # Never split inside an open code fence
+        while boundary != -1 and text.count("```", 0, boundary) % 2:
+            boundary = text.rfind("\n\n", 0, boundary)
+        if boundary == -1:
+            return
+        self.placeholder.markdown(text[:boundary])
+        self.placeholder = self.body.empty()
+        rest = text[boundary + 2:]
+        self.paragraph = [rest] if rest else []
+
+    def flush(self):
+        if self.pending_newline:
+            self._freeze_paragraphs()
+        if self.paragraph:
+            self.placeholder.markdown("".join(self.paragraph))
+        self.pending_chars = 0
+        self.pending_newline = False
+        self.last_flush = time.monotonic()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.tokens.append(token)
+        self.paragraph.append(token)
+        self.pending_chars += len(token)
+        self.pending_newline = self.pending_newline or "\n" in token
+        if (self.pending_chars >= self.flush_chars
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def on_llm_end(self, response, **kwargs):
+        self.flush()
+
+    def on_llm_error(self, error: BaseException, **kwargs):
+        self.flush()
+
+class FirstTokenTimer(BaseCallbackHandler):
+    """Records time to first token and total generation time of one call."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = False
+
     def on_llm_new_token(self, token: str, **kwargs):
-        self.text += token
-        self.container.markdown(self.text)
+        if not self.first_token:
+            self.first_token = True
+            metrics.observe("llm_first_token", time.perf_counter() - self.started)
+
+    def on_llm_end(self, response, **kwargs):
+        metrics.observe("llm_generation", time.perf_counter() - self.started)
 
 class LLMManager:
+    """Answers questions with the chat model; safe to share across sessions.
+
+    Callbacks are passed per call, never set on the shared model, so
+    concurrent sessions only receive their own tokens. Generations in flight
+    are bounded by LLM_MAX_CONCURRENCY, over a pooled HTTP client. Async
+    callers (e.g. an ASGI server) use `astream_response`, which gets its own
+    async client and limiter for each event loop.
+    """
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model_name=config.LLM_MODEL,
-            temperature=0.7,
+        self.llm = self._chat_model(http_client=get_http_client())
+        self.summary_llm = ChatOpenAI(
+            model=config.LLM_MODEL,
+            temperature=0,
             api_key=config.OPENAI_API_KEY,
-            streaming=True
+            base_url=config.OPENAI_BASE_URL,
+            max_tokens=config.HISTORY_SUMMARY_TOKENS,
+            http_client=get_http_client()
         )
+        self.context_packer = ContextPacker()
+        self._limiter = threading.BoundedSemaphore(config.LLM_MAX_CONCURRENCY)
+        self._async_resources = weakref.WeakKeyDictionary()  # event loop -> (chain, semaphore)
         
         self.system_prompt = """You are an AI travel assistant designed to provide clear, concise, and precise answers. Use the provided context and entire chat history to ensure accurate responses. 
         Acknowledge when context is insufficient and avoid hallucinating. Always consider the user's intent from the conversation history.
@@ -41,35 +135,109 @@ class LLMManager:
             ("human", self.human_prompt)
         ])
         
-        self.chain = (
-            {"context": RunnablePassthrough(), 
-             "chat_history": RunnablePassthrough(), 
-             "question": RunnablePassthrough()}
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+        # The prompt takes the input dict directly, so each field is sent once
+        self.chain = self.prompt | self.llm | StrOutputParser()
+
+    @staticmethod
+    def _chat_model(**client_kwargs) -> ChatOpenAI:
+        return ChatOpenAI(
+            model=config.LLM_MODEL,
+            temperature=0.7,
+            api_key=config.OPENAI_API_KEY,
+            base_url=config.OPENAI_BASE_URL,
+            timeout=config.LLM_TIMEOUT,
+            streaming=True,
+            **client_kwargs
         )
+
+    def _async_chain(self) -> Tuple:
+        """Chain and limiter bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        resources = self._async_resources.get(loop)
+        if resources is None:
+            import httpx
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=config.LLM_MAX_CONCURRENCY,
+                                    max_keepalive_connections=config.LLM_MAX_CONCURRENCY),
+                timeout=config.LLM_TIMEOUT
+            )
+            llm = self._chat_model(http_async_client=http_client)
+            resources = (self.prompt | llm | StrOutputParser(), asyncio.Semaphore(config.LLM_MAX_CONCURRENCY))
+            self._async_resources[loop] = resources
+        return resources
+
+    def _build_inputs(
+        self,
+        question: str,
+        context: List[Dict],
+        chat_history: Optional[Union[ConversationMemory, List[Dict]]]
+    ) -> Dict[str, str]:
+        """Prompt inputs: context packed into CONTEXT_TOKEN_BUDGET tokens, best chunks first."""
+        with metrics.span("prompt_assembly"):
+            if isinstance(chat_history, ConversationMemory):
+                formatted_history = chat_history.format()
+            else:
+                formatted_history = format_chat_history(chat_history) if chat_history else ""
+            return {
+                "context": self.context_packer.format(context),
+                "chat_history": formatted_history,
+                "question": question
+            }
     
     def generate_response(
         self,
         question: str,
         context: List[Dict],
-        chat_history: Optional[List[Dict]] = None,
+        chat_history: Optional[Union[ConversationMemory, List[Dict]]] = None,
         streaming_container = None
     ) -> str:
-        """Generate a streaming response based on context and chat history."""
-        formatted_context = "\n\n".join([doc['text'] for doc in context])
-        formatted_history = format_chat_history(chat_history) if chat_history else ""
-        
-        callbacks = [StreamHandler(streaming_container)] if streaming_container else None
-        
-        # Update the LLM's callbacks for this specific generation
-        self.llm.callbacks = callbacks
-        
-        response = self.chain.invoke({
-            "context": formatted_context,
-            "chat_history": formatted_history,
-            "question": question
-        })
+        """Generate a streaming response based on context and chat history.
+
+        `chat_history` should not contain the current question.
+        """
+        inputs = self._build_inputs(question, context, chat_history)
+        callbacks = [StreamHandler(streaming_container)] if streaming_container else []
+        if metrics.active:
+            callbacks.append(FirstTokenTimer())
         
-        return response
\ No newline at end of file
+        with self._limiter:
+            return self.chain.invoke(inputs, config={"callbacks": callbacks})
+
+    async def astream_response(
+        self,
+        question: str,
+        context: List[Dict],
+        chat_history: Optional[Union[ConversationMemory, List[Dict]]] = None
+    ) -> AsyncIterator[str]:
+        """Yield the answer token by token without blocking the event loop."""
+        inputs = self._build_inputs(question, context, chat_history)
+        chain, semaphore = self._async_chain()
+        async with semaphore:
+            started = time.perf_counter()
+            first_token = True
+            async for token in chain.astream(inputs):
+                if first_token:
+                    metrics.observe("llm_first_token", time.perf_counter() - started)
+                    first_token = False
+                yield token
+            metrics.observe("llm_generation", time.perf_counter() - started)
+
+    def summarize_history(self, summary: str, messages: str) -> str:
+        """Fold older chat messages into the rolling conversation summary."""
+        prompt = (
+            f"Update the summary of a conversation between a user and a travel assistant. "
+            f"Keep names, flight details, dates and open questions; stay under "
+            f"{config.HISTORY_SUMMARY_TOKENS} tokens.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{messages}\n\nUpdated summary:"
+        )
+        with self._limiter:
+            return self.summary_llm.invoke(prompt).content.strip()
+
+    def replay_response(self, text: str, streaming_container=None) -> str:
+        """Stream an already known answer (e.g. from the answer cache) word by word."""
+        if streaming_container is not None:
+            handler = StreamHandler(streaming_container)
+            for token in re.findall(r'\S+\s*|\s+', text):
+                handler.on_llm_new_token(token)
+            handler.on_llm_end(None)
+        return text
\ No newline at end of file
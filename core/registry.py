@@ -0,0 +1,162 @@
+# core/registry.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from utils.config import config
+
+
+class ModelRegistry:
+    """Process-wide registry of heavy models and clients.
+
+    Each resource is created lazily by its factory the first time it is
+    requested and the same instance is handed to every caller afterwards.
+    """
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register a factory for a named resource without loading it."""
+        with self._registry_lock:
+            self._factories.setdefault(name, factory)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str, factory: Optional[Callable[[], Any]] = None) -> Any:
+        """Return the shared instance for `name`, creating it on first use."""
+        if name in self._instances:
+            return self._instances[name]
+
+        if factory is not None:
+            self.register(name, factory)
+        if name not in self._factories:
+            raise KeyError(f"No factory registered for resource: {name}")
+
+        with self._locks[name]:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+        return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Eagerly load the given resources (all registered ones by default)."""
+        for name in list(names if names is not None else self._factories):
+            self.get(name)
+
+    def release(self, name: str):
+        """Drop the shared reference so the resource can be garbage collected."""
+        with self._registry_lock:
+            self._instances.pop(name, None)
+
+
+registry = ModelRegistry()
+
+
+def get_embedder(model_name: str = config.EMBEDDING_MODEL):
+    """Shared HuggingFace embedder for `model_name`."""
+    def factory():
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cuda' if config.USE_GPU else 'cpu'},
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': config.EMBEDDING_BATCH_SIZE}
+        )
+    return registry.get(f"embedder:{model_name}", factory)
+
+
+def get_reranker(model_name: str = config.RERANKER_MODEL):
+    """Shared cross-encoder for `model_name`."""
+    def factory():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, device='cuda' if config.USE_GPU else 'cpu')
+    return registry.get(f"reranker:{model_name}", factory)
+
+
+def get_tokenizer(model_name: str = config.LLM_MODEL):
+    """Shared tiktoken encoding for `model_name`."""
+    def factory():
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    return registry.get(f"tokenizer:{model_name}", factory)
+
+
+def get_http_client():
+    """Shared pooled HTTP client for OpenAI-compatible chat completions."""
+    def factory():
+        import httpx
+        return httpx.Client(
+            limits=httpx.Limits(max_connections=config.LLM_MAX_CONCURRENCY,
+                                max_keepalive_connections=config.LLM_MAX_CONCURRENCY),
+            timeout=config.LLM_TIMEOUT
+        )
+    return registry.get("http:client", factory)
+
+
+def get_pinecone_client():
+    """Shared Pinecone client."""
+    def factory():
+        from pinecone import Pinecone
+        return Pinecone(
+            api_key=config.PINECONE_API_KEY,
+            environment=config.PINECONE_ENVIRONMENT
+        )
+    return registry.get("pinecone:client", factory)
+
+
+def get_pinecone_index(index_name: str = config.PINECONE_INDEX_NAME):
+    """Shared Pinecone index handle, created on the server if it does not exist."""
+    def factory():
+        from pinecone import ServerlessSpec
+        pc = get_pinecone_client()
+        if index_name not in pc.list_indexes().names():
+            pc.create_index(
+                name=index_name,
+                dimension=config.EMBEDDING_DIMENSION,
+                metric='cosine',
+                spec=ServerlessSpec(
+                    cloud='aws',
+                    region='us-east-1'
+                )
+            )
+        # One pooled connection per concurrent upsert
+        return pc.Index(index_name, pool_threads=config.UPSERT_CONCURRENCY)
+    return registry.get(f"pinecone:index:{index_name}", factory)
+
+
+def get_redis_client():
+    """Shared redis client, or None when REDIS_URL is not configured."""
+    if not config.REDIS_URL:
+        return None
+
+    def factory():
+        import redis
+        return redis.Redis.from_url(config.REDIS_URL)
+    return registry.get("redis:client", factory)
+
+
+def warm_up(include_index: bool = True, wait: bool = True) -> List[Future]:
+    """Load the models and clients concurrently, optionally connecting to the index.
+
+    With wait=False the loads continue in the background and the futures are
+    returned immediately, so a UI can render while the models load; any
+    caller that needs a resource before then simply blocks on its registry lock.
+    """
+    loaders: List[Callable[[], Any]] = [get_embedder, get_tokenizer]
+    if config.RERANKER_ENABLED:
+        loaders.append(get_reranker)
+    if include_index and config.VECTOR_BACKEND == 'pinecone':
+        loaders.append(get_pinecone_index)
+
+    executor = ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="warm-up")
+    futures = [executor.submit(loader) for loader in loaders]
+    executor.shutdown(wait=False)
+    if wait:
+        for future in futures:
+            future.result()
+    return futures
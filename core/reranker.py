@@ -0,0 +1,73 @@
+# core/reranker.py
+import hashlib
+import time
+from typing import Dict, List, Optional
+from utils.config import config
+from utils.cache import LRUCache
+from core.registry import registry, get_reranker
+
+
+class CrossEncoderReranker:
+    """Rescores retrieved chunks with a cross-encoder over (query, chunk) pairs.
+
+    Pairs are scored in batches of RERANKER_BATCH_SIZE, one forward pass per
+    batch, and scores are cached by (query hash, chunk ID); chunk IDs are
+    content hashes, so a cached score can never belong to stale text. Once the
+    latency budget is spent the remaining candidates are not scored; the first
+    `max_unscored` of them keep their retrieval order after the reranked ones,
+    without a relevance_score and unfiltered by `min_score`.
+    """
+    def __init__(
+        self,
+        model_name: str = config.RERANKER_MODEL,
+        batch_size: int = config.RERANKER_BATCH_SIZE,
+        min_score: float = config.MIN_RELEVANCE_SCORE,
+        latency_budget: Optional[float] = config.RERANKER_LATENCY_BUDGET,
+        max_unscored: int = config.RERANKER_MAX_UNSCORED
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.min_score = min_score
+        self.latency_budget = latency_budget
+        self.max_unscored = max_unscored
+        self.score_cache = registry.get(
+            f"rerank_cache:{model_name}", lambda: LRUCache(max_size=config.RERANK_CACHE_SIZE)
+        )
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        # CrossEncoder applies a sigmoid to single-label models, so scores are in [0, 1]
+        scores = get_reranker(self.model_name).predict(
+            [(query, text) for text in texts],
+            batch_size=len(texts),
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
+
+    def rerank(self, query: str, candidates: List[Dict]) -> List[Dict]:
+        """Candidates scoring above MIN_RELEVANCE_SCORE, best first, then any left unscored.
+
+        Candidates are only left unscored when the latency budget runs out,
+        and at most `max_unscored` of them are returned.
+        """
+        query_hash = hashlib.sha256(query.encode()).hexdigest()
+        keys = [f"{query_hash}:{doc['metadata']['chunk_id']}" for doc in candidates]
+        scores = [self.score_cache.get(key) for key in keys]
+
+        started = time.perf_counter()
+        pending = [i for i, score in enumerate(scores) if score is None]
+        for start in range(0, len(pending), self.batch_size):
+            if self.latency_budget is not None and time.perf_counter() - started > self.latency_budget:
+                break
+            batch = pending[start:start + self.batch_size]
+            for i, score in zip(batch, self._score(query, [candidates[i]['text'] for i in batch])):
+                scores[i] = score
+                self.score_cache.set(keys[i], score)
+
+        scored = [
+            {**doc, 'relevance_score': score}
+            for doc, score in zip(candidates, scores)
+            if score is not None and score >= self.min_score
+        ]
+        scored.sort(key=lambda x: x['relevance_score'], reverse=True)
+        unscored = [doc for doc, score in zip(candidates, scores) if score is None][:self.max_unscored]
+        return scored + unscored
@@ -1,24 +1,129 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
+import numpy as np
 from utils.config import config
+from utils.metrics import metrics
+from core.reranker import CrossEncoderReranker
+from core.diversity import drop_near_duplicates, maximal_marginal_relevance
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = config.RRF_K) -> List[Dict]:
+    """Merge ranked result lists by summing 1 / (k + rank) per chunk."""
+    fused: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            chunk_id = result['metadata']['chunk_id']
+            entry = fused.setdefault(chunk_id, {**result, 'score': 0.0})
+            entry.update({key: value for key, value in result.items() if key not in entry})
+            entry['score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda x: x['score'], reverse=True)
+
 
 class RetrievalOptimizer:
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, reranker: Optional[CrossEncoderReranker] = None, embedding_manager=None):
         self.vector_store = vector_store
-        
-    async def get_relevant_chunks(
+        self.lexical_index = vector_store.lexical_index
+        if reranker is None and config.RERANKER_ENABLED:
+            reranker = CrossEncoderReranker()
+        self.reranker = reranker
+        if config.MMR_ENABLED and embedding_manager is None:
+            from core.embeddings import EmbeddingManager
+            embedding_manager = EmbeddingManager()
+        self.embedding_manager = embedding_manager if config.MMR_ENABLED else None
+
+    async def _retrieve(
         self,
         query: str,
         embedding: List[float],
-        k: int = 3
+        k: int,
+        filters: Optional[Dict]
     ) -> List[Dict]:
-        """Get relevant chunks asynchronously."""
-        # Perform search
-        results = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: self.vector_store.search(query, embedding, k)
+        """Dense results, fused with BM25 results when hybrid search is enabled.
+
+        Both retrievals run concurrently and their rankings are merged with
+        reciprocal rank fusion, so exact terms such as flight numbers or fare
+        codes are not lost.
+        """
+        if self.lexical_index is None:
+            results = await asyncio.to_thread(self.vector_store.search, query, embedding, k, filters)
+            # Sort by relevance score
+            return sorted(results, key=lambda x: x['distance'])
+
+        candidates = max(k, config.HYBRID_CANDIDATES)
+        # to_thread carries the request's context along, so profiled stage timings stay attached
+        dense, lexical = await asyncio.gather(
+            asyncio.to_thread(self.vector_store.search, query, embedding, candidates, filters),
+            asyncio.to_thread(self._lexical_search, query, candidates, filters)
         )
-        
-        # Sort by relevance score
-        return sorted(results, key=lambda x: x['distance'])
-        
\ No newline at end of file
+        dense = sorted(dense, key=lambda x: x['distance'])
+        return reciprocal_rank_fusion([dense, lexical])
+
+    def _lexical_search(self, query: str, k: int, filters: Optional[Dict]) -> List[Dict]:
+        with metrics.span("lexical_search"):
+            return self.lexical_index.search(query, k, filters)
+
+    def _rerank(self, query: str, candidates: List[Dict]) -> List[Dict]:
+        with metrics.span("rerank"):
+            return self.reranker.rerank(query, candidates)
+
+    def _diversify(self, embedding: List[float], candidates: List[Dict], k: int) -> List[Dict]:
+        """Drop near-duplicate chunks, then pick k of the rest by maximal marginal relevance.
+
+        Candidate vectors are the ones stored in the vector backend, so this
+        costs no model calls.
+        """
+        with metrics.span("diversify"):
+            candidates = drop_near_duplicates(candidates)
+            if self.embedding_manager is None or len(candidates) <= 1:
+                return candidates[:k]
+            return self._select_mmr(embedding, candidates, k)
+
+    def _candidate_embeddings(self, candidates: List[Dict]) -> np.ndarray:
+        chunk_ids = [doc['metadata']['chunk_id'] for doc in candidates]
+        stored = self.vector_store.fetch_embeddings(chunk_ids)
+        # Only chunks missing from the backend (e.g. BM25 hits not yet upserted) are embedded
+        missing = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in stored]
+        embedded = self.embedding_manager.generate_embeddings(
+            [candidates[i]['text'] for i in missing]
+        ) if missing else []
+        vectors = [stored.get(chunk_id) for chunk_id in chunk_ids]
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _select_mmr(self, embedding: List[float], candidates: List[Dict], k: int) -> List[Dict]:
+        embeddings = self._candidate_embeddings(candidates)
+        if all('relevance_score' in doc for doc in candidates):
+            relevance = np.asarray([doc['relevance_score'] for doc in candidates], dtype=np.float32)
+        else:
+            query = np.asarray(embedding, dtype=np.float32)
+            relevance = embeddings @ query / (
+                np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query) + 1e-12
+            )
+        return [candidates[i] for i in maximal_marginal_relevance(relevance, embeddings, k)]
+
+    async def get_relevant_chunks(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int = 3,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Get relevant chunks asynchronously.
+
+        With the reranker enabled, RERANKER_CANDIDATES chunks are retrieved
+        and rescored by the cross-encoder; chunks below MIN_RELEVANCE_SCORE
+        are dropped, so fewer than k may be returned. If the reranker's latency
+        budget runs out, up to RERANKER_MAX_UNSCORED unscored chunks follow in
+        retrieval order. Near-duplicates are
+        then removed and the final k are chosen by maximal marginal relevance.
+        """
+        fetch_k = k
+        if self.reranker is not None:
+            fetch_k = max(fetch_k, config.RERANKER_CANDIDATES)
+        if self.embedding_manager is not None:
+            fetch_k = max(fetch_k, config.MMR_CANDIDATES)
+        candidates = (await self._retrieve(query, embedding, fetch_k, filters))[:fetch_k]
+        if self.reranker is not None:
+            candidates = await asyncio.to_thread(self._rerank, query, candidates)
+        return await asyncio.to_thread(self._diversify, embedding, candidates, k)
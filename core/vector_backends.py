@@ -0,0 +1,88 @@
+# core/vector_backends.py
+from typing import Dict, List, Optional
+from utils.config import config
+from core.registry import registry, get_pinecone_index
+
+
+def matches_filters(metadata: Dict, filters: Dict) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter language used by the app.
+
+    Supports plain equality and the $eq, $ne, $in and $nin operators.
+    """
+    for field, condition in filters.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, operand in condition.items():
+            if operator == '$eq' and value != operand:
+                return False
+            if operator == '$ne' and value == operand:
+                return False
+            if operator == '$in' and value not in operand:
+                return False
+            if operator == '$nin' and value in operand:
+                return False
+            if operator not in ('$eq', '$ne', '$in', '$nin'):
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return True
+
+
+class PineconeBackend:
+    """Vector backend backed by a Pinecone serverless index.
+
+    The client is only created, and the index only looked up on the server,
+    when the first request is made.
+    """
+    def __init__(self, index_name: str = config.PINECONE_INDEX_NAME):
+        self.index_name = index_name
+
+    @property
+    def index(self):
+        return get_pinecone_index(self.index_name)
+
+    def upsert(self, vectors: List[Dict]):
+        self.index.upsert(vectors=vectors)
+
+    def delete(self, ids: List[str]):
+        batch_size = 1000  # Pinecone limit for ids per delete request
+        for i in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[i:i + batch_size])
+
+    def query(self, embedding: List[float], k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        results = self.index.query(
+            vector=embedding,
+            top_k=k,
+            include_metadata=True,
+            filter=filters
+        )
+        return [
+            {'id': match.id, 'score': match.score, 'metadata': match.metadata}
+            for match in results.matches
+        ]
+
+    def fetch(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors by ID; IDs not in the index are left out."""
+        vectors = {}
+        batch_size = 1000  # Pinecone limit for ids per fetch request
+        for i in range(0, len(ids), batch_size):
+            response = self.index.fetch(ids=ids[i:i + batch_size])
+            vectors.update({vector_id: list(vector.values) for vector_id, vector in response.vectors.items()})
+        return vectors
+
+    def flush(self):
+        """Pinecone persists every request; nothing to do."""
+
+
+def get_vector_backend(name: Optional[str] = None):
+    """Shared vector backend selected by VECTOR_BACKEND."""
+    name = name or config.VECTOR_BACKEND
+    if name == 'pinecone':
+        factory = PineconeBackend
+    elif name == 'faiss':
+        def factory():
+            # faiss is only imported by deployments that use it
+            from core.faiss_backend import FaissBackend
+            return FaissBackend()
+    else:
+        raise ValueError(f"Unsupported vector backend: {name}")
+    return registry.get(f"vector_backend:{name}", factory)
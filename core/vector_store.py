@@ -1,111 +1,208 @@
 # core/vector_store.py
-from pinecone import Pinecone, ServerlessSpec
-from typing import List, Dict, Optional
-import chromadb
-from chromadb.config import Settings
+from typing import List, Dict, Optional, Iterator
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import hashlib
+import json
+import time
 import numpy as np
-import streamlit as st
 from utils.config import config
+from utils.cache import LRUCache, RedisCache, GenerationCounter
+from utils.metrics import metrics
+from core.registry import registry, get_redis_client
+from core.vector_backends import get_vector_backend
+from core.answer_cache import get_answer_cache
+from core.lexical_index import get_lexical_index
 # from utils.s3_manager import S3Manager
 
-#################
-## Please comment this line while working on local machine
-import sys
-sys.modules["sqlite3"] = __import__("pysqlite3")
-####################
 
+def get_upsert_pool() -> ThreadPoolExecutor:
+    """Threads that send upsert requests, shared by every VectorStore in the process."""
+    return registry.get("vector_store:upsert_pool",
+                        lambda: ThreadPoolExecutor(max_workers=config.UPSERT_CONCURRENCY))
 
-class VectorStore:
-    def __init__(self):
-
-        pc = Pinecone(
-            api_key=config.PINECONE_API_KEY,
-            environment=config.PINECONE_ENVIRONMENT
-        )
 
-        print(f"{config.PINECONE_API_KEY} and {config.PINECONE_ENVIRONMENT} and {config.PINECONE_INDEX_NAME}")
-
-        if config.PINECONE_INDEX_NAME not in pc.list_indexes().names():
-            pc.create_index(
-                name=config.PINECONE_INDEX_NAME,
-                dimension=768,
-                metric='cosine',
-                spec=ServerlessSpec(
-                    cloud='aws',
-                    region='us-east-1'
-                )
-            )
-        
-        self.index = pc.Index(config.PINECONE_INDEX_NAME)
+class VectorStore:
+    def __init__(self, backend=None, lexical_index=None):
+        self.backend = backend or get_vector_backend(config.VECTOR_BACKEND)
+        if lexical_index is None and config.HYBRID_SEARCH_ENABLED:
+            lexical_index = get_lexical_index()
+        self.lexical_index = lexical_index
         self._initialize_cache()
     
     def _initialize_cache(self):
-        """Initialize an in-memory cache for frequent queries."""
-        self.cache = {}
-        self.cache_size = 1000  # This can be Adjusted based on our needs
-    
-    def _get_cache_key(self, query: str) -> str:
-        """Generate a cache key for a query."""
-        return str(hash(query))
-    
-    def _get_or_create_collection(self):
-        """Get existing collection or create new one."""
-        try:
-            return self.client.get_collection(config.COLLECTION_NAME)
-        except:
-            return self.client.create_collection(
-                name=config.COLLECTION_NAME,
-                metadata={"hnsw:space": config.DISTANCE_METRIC}
-            )
+        """Initialize the query result cache (redis when configured, else in-process)."""
+        redis_client = get_redis_client()
+        # Results of different indexes must never be served for each other
+        index_key = config.index_key()
+        if redis_client is not None:
+            self.cache = RedisCache(redis_client, f"vector_search:{index_key}", ttl=config.QUERY_CACHE_TTL)
+        else:
+            self.cache = LRUCache(max_size=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL)
+        self.cache_generation = GenerationCounter(f"vector_store-{index_key}", config.CACHE_DIR, redis_client)
+        self._seen_generation = None
+        # Chunk IDs are content hashes, so a stored vector never changes under its ID
+        self.vector_cache = LRUCache(max_size=config.STORED_VECTOR_CACHE_SIZE)
+
+    def _get_cache_key(self, embedding: List[float], k: int, filters: Optional[Dict]) -> str:
+        """Generate a stable cache key from the query embedding, k and filters.
+
+        The key includes the index generation, so any write makes older
+        entries unreachable.
+        """
+        generation = self.cache_generation.current()
+        if generation != self._seen_generation:
+            # Entries from older generations can never be hit again
+            if isinstance(self.cache, LRUCache):
+                self.cache.clear()
+            self._seen_generation = generation
+
+        digest = hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes())
+        digest.update(json.dumps({'k': k, 'filters': filters}, sort_keys=True, default=str).encode())
+        return f"{generation}:{digest.hexdigest()}"
+
+    def invalidate_cache(self, chunk_ids: Optional[List[str]] = None):
+        """Make every cached search result stale, in this and every other process,
+        and drop cached answers that were supported by the written chunks."""
+        self.cache_generation.bump()
+        if chunk_ids:
+            get_answer_cache().invalidate_chunks(chunk_ids)
+
+    def fetch_embeddings(self, chunk_ids: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors of indexed chunks, from memory or one backend request.
+
+        Chunks missing from the backend are left out of the result.
+        """
+        vectors, missing = {}, []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            vector = self.vector_cache.get(chunk_id)
+            if vector is None:
+                missing.append(chunk_id)
+            else:
+                vectors[chunk_id] = vector
+        if missing:
+            with metrics.span("fetch_vectors"):
+                fetched = self.backend.fetch(missing)
+            for chunk_id, vector in fetched.items():
+                self.vector_cache.set(chunk_id, vector)
+            vectors.update(fetched)
+        return vectors
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self.cache.stats()
     
+    def _payload_batches(self, vectors: List[Dict]) -> Iterator[List[Dict]]:
+        """Group vectors into batches bounded by serialized request size and count."""
+        batch, batch_bytes = [], 0
+        for vector in vectors:
+            vector_bytes = len(json.dumps(vector, default=str))
+            if batch and (batch_bytes + vector_bytes > config.UPSERT_MAX_BATCH_BYTES
+                          or len(batch) >= config.UPSERT_MAX_BATCH_VECTORS):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(vector)
+            batch_bytes += vector_bytes
+        if batch:
+            yield batch
 
-    ########################### new pinecone #####################
+    def _upsert_with_retry(self, vectors: List[Dict]):
+        """Upsert one batch, retrying it on its own with exponential backoff."""
+        for attempt in range(config.UPSERT_MAX_RETRIES + 1):
+            try:
+                return self.backend.upsert(vectors)
+            except Exception:
+                if attempt == config.UPSERT_MAX_RETRIES:
+                    raise
+                time.sleep(config.UPSERT_RETRY_BACKOFF * (2 ** attempt))
 
     def add_documents(self, documents: List[Dict[str, str]], embeddings: List[List[float]]):
-        """Add documents and their embeddings to Pinecone."""
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i + batch_size]
-            batch_embeddings = embeddings[i:i + batch_size]
-            
-            vectors = []
-            for doc, embedding in zip(batch_docs, batch_embeddings):
-                vectors.append({
-                    'id': doc['metadata']['chunk_id'],
-                    'values': embedding,
-                    'metadata': {
-                        'text': doc['text'],
-                        **doc['metadata']
-                    }
-                })
-            
-            self.index.upsert(vectors=vectors)
-
-    def search(self, query: str, embedding: List[float], k: int = 3) -> List[Dict]:
-        """Search for similar documents in Pinecone with logging."""
-        try:
-            # st.write("Debug: Searching Pinecone index...")
-            # st.write(f"Debug: Query length: {len(embedding)} dimensions")
-            
-            # Query Pinecone
-            results = self.index.query(
-                vector=embedding,
-                top_k=k,
-                include_metadata=True
-            )
-            
-            st.write(f"Debug: Found {len(results.matches)} matches")
-            
-            processed_results = []
-            for match in results.matches:
-                processed_results.append({
-                    'text': match.metadata['text'],
-                    'metadata': {k: v for k, v in match.metadata.items() if k != 'text'},
-                    'distance': 1 - match.score  # Convert cosine similarity to distance
-                })
-            
-            return processed_results
-            
-        except Exception as e:
-            st.error(f"Error during vector search: {str(e)}")
-            raise
\ No newline at end of file
+        """Add documents and their embeddings to the vector backend.
+
+        Batches are sized by payload bytes and upserted concurrently, with at
+        most UPSERT_CONCURRENCY requests in flight over the pooled connection.
+        If a batch still fails after its retries, the other batches are
+        finished, only their documents are added to the lexical index, and the
+        first error is raised.
+        """
+        chunk_ids = [doc['metadata']['chunk_id'] for doc in documents]
+        vectors = (
+            {
+                'id': doc['metadata']['chunk_id'],
+                'values': [float(value) for value in embedding],
+                'metadata': {
+                    'text': doc['text'],
+                    **doc['metadata']
+                }
+            }
+            for doc, embedding in zip(documents, embeddings)
+        )
+
+        pool = get_upsert_pool()
+        in_flight = {}  # future -> chunk IDs of its batch
+        errors = []
+        upserted = set()
+
+        def collect(done):
+            for future in done:
+                batch_ids = in_flight.pop(future)
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                else:
+                    upserted.update(batch_ids)
+
+        for batch in self._payload_batches(vectors):
+            if len(in_flight) >= config.UPSERT_CONCURRENCY:
+                collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            in_flight[pool.submit(self._upsert_with_retry, batch)] = [vector['id'] for vector in batch]
+
+        collect(wait(in_flight).done)
+        self.backend.flush()
+        if self.lexical_index is not None:
+            # Documents without a stored vector must not become retrievable by BM25
+            indexed = [doc for doc in documents if doc['metadata']['chunk_id'] in upserted]
+            if indexed:
+                self.lexical_index.add_documents(indexed)
+        self.invalidate_cache(chunk_ids)
+        if errors:
+            raise errors[0]
+
+    def delete_documents(self, chunk_ids: List[str]):
+        """Delete vectors by chunk ID from the vector backend and lexical index."""
+        self.backend.delete(chunk_ids)
+        self.backend.flush()
+        if self.lexical_index is not None:
+            self.lexical_index.delete_documents(chunk_ids)
+        self.invalidate_cache(chunk_ids)
+
+    def search(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int = 3,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Search for similar documents in the vector backend with logging.
+
+        Results are served from the query cache when the same embedding, k and
+        filters were searched since the last write to the index.
+        """
+        cache_key = None
+        if config.QUERY_CACHE_ENABLED:
+            cache_key = self._get_cache_key(embedding, k, filters)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+
+        with metrics.span("vector_search"):
+            matches = self.backend.query(embedding, k, filters)
+
+        processed_results = []
+        for match in matches:
+            processed_results.append({
+                'text': match['metadata']['text'],
+                'metadata': {k: v for k, v in match['metadata'].items() if k != 'text'},
+                'distance': 1 - match['score']  # Convert cosine similarity to distance
+            })
+
+        if cache_key is not None:
+            self.cache.set(cache_key, json.dumps(processed_results, default=str))
+        return processed_results
@@ -0,0 +1,145 @@
+# tests/test_llm_concurrency.py
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from utils.config import config
+from core.context_packer import ContextPacker, TokenCounter
+from core.llm import LLMManager
+
+CALLERS = 12
+MAX_CONCURRENCY = 3
+
+
+def expected_answer(question: str) -> str:
+    return "".join(f"{question}-token-{i} " for i in range(5))
+
+
+class StubCompletions(ThreadingHTTPServer):
+    """OpenAI-compatible chat completions server that streams back the question.
+
+    Every answer is `expected_answer(question)`, sent one token per chunk with
+    a short pause, and the number of requests being answered at once is
+    tracked in `max_in_flight`.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_chunk(self, delta, finish_reason=None):
+        chunk = {
+            'id': "chatcmpl-stub", 'object': "chat.completion.chunk", 'created': 0, 'model': config.LLM_MODEL,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        question = body['messages'][-1]['content']
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self._send_chunk({'role': "assistant", 'content': ""})
+            for token in re.findall(r'\S+\s*', expected_answer(question)):
+                time.sleep(0.01)
+                self._send_chunk({'content': token})
+            self._send_chunk({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class WordCounter(TokenCounter):
+    """Counts words, so the tests need no tiktoken download."""
+    def count(self, text, key=None):
+        return len(text.split())
+
+
+class FakeContainer:
+    """Stands in for a Streamlit container and keeps everything drawn into it."""
+    def __init__(self):
+        self.drawn = []
+
+    def container(self):
+        return self
+
+    def empty(self):
+        return self
+
+    def markdown(self, text):
+        self.drawn.append(text)
+
+
+@pytest.fixture
+def stub_server():
+    server = StubCompletions()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(monkeypatch, stub_server):
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(config, "OPENAI_BASE_URL", f"http://127.0.0.1:{stub_server.server_port}/v1")
+    monkeypatch.setattr(config, "LLM_MAX_CONCURRENCY", MAX_CONCURRENCY)
+    manager = LLMManager()
+    manager.context_packer = ContextPacker(counter=WordCounter())
+    return manager
+
+
+def test_generate_response_concurrent_callers(manager, stub_server):
+    questions = [f"caller{i}" for i in range(CALLERS)]
+    containers = [FakeContainer() for _ in questions]
+
+    def ask(i):
+        return manager.generate_response(questions[i], [], streaming_container=containers[i])
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        answers = list(pool.map(ask, range(CALLERS)))
+
+    for question, answer, container in zip(questions, answers, containers):
+        assert answer == expected_answer(question)
+        drawn = " ".join(container.drawn)
+        assert set(re.findall(r'caller\d+', drawn)) == {question}
+    assert stub_server.max_in_flight == MAX_CONCURRENCY
+
+
+def test_astream_response_concurrent_callers(manager, stub_server):
+    questions = [f"caller{i}" for i in range(CALLERS)]
+
+    async def ask(question):
+        return [token async for token in manager.astream_response(question, [])]
+
+    async def ask_all():
+        return await asyncio.gather(*(ask(question) for question in questions))
+
+    for question, tokens in zip(questions, asyncio.run(ask_all())):
+        assert "".join(tokens) == expected_answer(question)
+    assert stub_server.max_in_flight == MAX_CONCURRENCY
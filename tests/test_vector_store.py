@@ -0,0 +1,134 @@
+# tests/test_vector_store.py
+import json
+import threading
+import time
+from typing import Dict, List
+import pytest
+from utils.config import config
+from core.vector_store import VectorStore
+
+
+class FakeBackend:
+    """In-memory vector backend that records every upsert request.
+
+    `failures` maps a batch's first vector ID to how many times its upsert
+    fails before succeeding.
+    """
+    def __init__(self, delay: float = 0.0, failures: Dict[str, int] = None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.batches: List[List[Dict]] = []
+        self.attempts: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.flushed = False
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict]):
+        first = vectors[0]['id']
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.attempts[first] = self.attempts.get(first, 0) + 1
+            failing = self.failures.get(first, 0) > 0
+            if failing:
+                self.failures[first] -= 1
+        try:
+            time.sleep(self.delay)
+            if failing:
+                raise ConnectionError(f"upsert of batch {first} failed")
+            with self._lock:
+                self.batches.append(vectors)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def flush(self):
+        self.flushed = True
+
+
+class FakeLexicalIndex:
+    def __init__(self):
+        self.documents = []
+
+    def add_documents(self, documents: List[Dict]):
+        self.documents.extend(documents)
+
+
+@pytest.fixture
+def make_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(config, "REDIS_URL", None)
+    monkeypatch.setattr(config, "UPSERT_RETRY_BACKOFF", 0)
+
+    def make(backend: FakeBackend, **settings) -> VectorStore:
+        for name, value in settings.items():
+            monkeypatch.setattr(config, name, value)
+        store = VectorStore(backend=backend, lexical_index=FakeLexicalIndex())
+        monkeypatch.setattr(store, "invalidate_cache", lambda chunk_ids=None: None)
+        return store
+
+    return make
+
+
+def documents(count: int, text_size: int = 10):
+    docs = [{'text': "x" * text_size, 'metadata': {'chunk_id': f"chunk-{i:04d}"}} for i in range(count)]
+    return docs, [[0.1, 0.2, 0.3]] * count
+
+
+def test_batches_bounded_by_vector_count(make_store):
+    backend = FakeBackend()
+    store = make_store(backend, UPSERT_MAX_BATCH_VECTORS=7, UPSERT_MAX_BATCH_BYTES=10_000_000)
+    store.add_documents(*documents(30))
+
+    sizes = sorted(len(batch) for batch in backend.batches)
+    assert sizes == [2, 7, 7, 7, 7]
+    assert backend.flushed
+
+
+def test_batches_bounded_by_payload_bytes(make_store):
+    backend = FakeBackend()
+    store = make_store(backend, UPSERT_MAX_BATCH_VECTORS=1000, UPSERT_MAX_BATCH_BYTES=2000)
+    docs, embeddings = documents(40, text_size=300)
+    store.add_documents(docs, embeddings)
+
+    assert len(backend.batches) > 1
+    for batch in backend.batches:
+        assert sum(len(json.dumps(vector, default=str)) for vector in batch) <= 2000
+    assert sorted(v['id'] for batch in backend.batches for v in batch) == [d['metadata']['chunk_id'] for d in docs]
+
+
+def test_at_most_upsert_concurrency_requests_in_flight(make_store):
+    backend = FakeBackend(delay=0.02)
+    store = make_store(backend, UPSERT_CONCURRENCY=3, UPSERT_MAX_BATCH_VECTORS=1)
+    store.add_documents(*documents(20))
+
+    assert len(backend.batches) == 20
+    assert backend.max_in_flight == 3
+
+
+def test_failing_batch_is_retried_on_its_own(make_store):
+    backend = FakeBackend(failures={"chunk-0005": 2})
+    store = make_store(backend, UPSERT_MAX_BATCH_VECTORS=5, UPSERT_MAX_RETRIES=3)
+    store.add_documents(*documents(20))
+
+    assert backend.attempts == {"chunk-0000": 1, "chunk-0005": 3, "chunk-0010": 1, "chunk-0015": 1}
+    assert len(backend.batches) == 4
+
+
+def test_first_error_raised_after_other_batches_finish(make_store):
+    backend = FakeBackend(delay=0.01, failures={"chunk-0000": 10, "chunk-0010": 10})
+    store = make_store(backend, UPSERT_CONCURRENCY=2, UPSERT_MAX_BATCH_VECTORS=5, UPSERT_MAX_RETRIES=1)
+    docs, embeddings = documents(30)
+
+    with pytest.raises(ConnectionError, match="chunk-0000"):
+        store.add_documents(docs, embeddings)
+
+    assert sorted(batch[0]['id'] for batch in backend.batches) == [
+        "chunk-0005", "chunk-0015", "chunk-0020", "chunk-0025"
+    ]
+    assert backend.attempts["chunk-0000"] == backend.attempts["chunk-0010"] == 2
+    assert backend.flushed
+    # Only documents whose vectors were stored are searchable by BM25
+    failed = {f"chunk-{i:04d}" for i in range(0, 5)} | {f"chunk-{i:04d}" for i in range(10, 15)}
+    assert store.lexical_index.documents == [doc for doc in docs if doc['metadata']['chunk_id'] not in failed]
@@ -0,0 +1,135 @@
+# utils/cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional TTL and hit/miss counters."""
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or entry[1] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._data)
+        }
+
+
+class RedisCache:
+    """Shared cache on redis with the same interface as LRUCache.
+
+    Values must be strings or bytes; eviction is left to redis (TTL plus the
+    server's maxmemory policy).
+    """
+    def __init__(self, client, namespace: str, ttl: Optional[float] = None):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: Any):
+        self.client.set(self._key(key), value, ex=int(self.ttl) if self.ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self._key("*")):
+            self.client.delete(key)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+class GenerationCounter:
+    """Monotonic counter used to invalidate caches across processes.
+
+    Cache keys include the current generation, so bumping it makes every
+    existing entry unreachable. Lives in redis when a client is given,
+    otherwise in a small file that all local processes can stat cheaply.
+    """
+    def __init__(self, name: str, directory: Path, client=None):
+        self.name = name
+        self.client = client
+        self.path = Path(directory) / f"{name}.generation"
+
+    def current(self) -> str:
+        if self.client is not None:
+            value = self.client.get(f"generation:{self.name}")
+            return value.decode() if isinstance(value, bytes) else str(value or 0)
+        try:
+            stat = self.path.stat()
+            # os.replace gives every bump a new inode, even within one mtime tick
+            return f"{stat.st_mtime_ns}:{stat.st_ino}"
+        except FileNotFoundError:
+            return "0"
+
+    def bump(self):
+        if self.client is not None:
+            self.client.incr(f"generation:{self.name}")
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(str(time.time_ns()))
+        os.replace(tmp_path, self.path)
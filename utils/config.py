@@ -1,4 +1,5 @@
 # utils/config.py
+import hashlib
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -11,17 +12,28 @@ class Config:
     DATA_DIR = BASE_DIR / "data"
     DB_DIR = BASE_DIR / "storage" / "vectordb"
     
-    # Create directories if they don't exist
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    DB_DIR.mkdir(parents=True, exist_ok=True)
-    
     # Model settings
     EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+    EMBEDDING_DIMENSION = 768
     LLM_MODEL = "gpt-3.5-turbo-0125"
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. a local stub server; OpenAI when unset
+    LLM_MAX_CONCURRENCY = 32  # Chat completions in flight per process
+    LLM_TIMEOUT = 60  # Seconds
     
     # Document processing
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    SEMANTIC_MERGE_THRESHOLD = 0.8  # Adjacent chunks above this cosine similarity are merged
+    PDF_EXTRACTION_WORKERS = os.cpu_count() or 1
+    PDF_PAGES_PER_TASK = 16  # Page range handed to each extraction worker
+    INGEST_WINDOW = 2 * PDF_EXTRACTION_WORKERS  # Page ranges in flight while streaming a file
+    INGEST_PAGE_BATCH = 16  # Pages chunked, embedded and upserted together
+
+    # Background ingestion jobs
+    INGEST_WORKERS = 1  # Each worker process loads its own embedding model
+    JOB_POLL_INTERVAL = 2.0  # Seconds between queue polls (workers and upload page)
+    JOB_HEARTBEAT_TIMEOUT = 300  # Running jobs without progress for this long are reclaimed
+    JOB_MAX_ATTEMPTS = 3
     
     # API Keys
     # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -33,38 +45,152 @@ class Config:
     # Pinecone settings
     PINECONE_INDEX_NAME = "document-embeddings"
 
-    if not OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    if not PINECONE_API_KEY:
-        raise ValueError("PINECONE_API_KEY not found in environment variables")
-    if not PINECONE_ENVIRONMENT:
-        raise ValueError("PINECONE_ENVIRONMENT not found in environment variables")
-    
     # App settings
     APP_TITLE = "IndiGo Policies Chatbot"
     MAX_HISTORY_LENGTH = 10
+
+    # Batch question answering (core/batch_qa.py)
+    BATCH_QA_EMBED_BATCH = 256  # Questions embedded per model call
+    BATCH_QA_RETRIEVAL_CONCURRENCY = 16
+    BATCH_QA_LLM_CONCURRENCY = 16  # Keep within the OpenAI account's rate limit
+    BATCH_QA_CONTEXT_CHUNKS = 5
+    BATCH_QA_MAX_RETRIES = 6  # Retries of a rate-limited LLM call
+    BATCH_QA_RETRY_BACKOFF = 1.0  # Seconds, doubled on every retry unless the API says otherwise
+    BATCH_QA_FLUSH_ROWS = 100  # Answers per Parquet part file
+
+    # Stage latency metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_DIR = os.getenv("METRICS_DIR")  # Write <pid>.prom files here (node_exporter textfile format)
+    METRICS_FLUSH_INTERVAL = 15  # Seconds between metrics file writes
+
+    # Request profiling (dumps under CACHE_DIR/profiles)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.01"))  # Share of requests when enabled
+    PROFILING_TRACEMALLOC_FRAMES = 10
+
+    # HTTP API (app/api.py)
+    API_HOST = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))  # Each worker loads its own models
     
     # Vector DB settings
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" or "faiss"
     COLLECTION_NAME = "documents"
     DISTANCE_METRIC = "cosine"
-    
+    UPSERT_MAX_BATCH_BYTES = 1_500_000  # Stay below Pinecone's 2MB request limit
+    UPSERT_MAX_BATCH_VECTORS = 1000
+    UPSERT_CONCURRENCY = 8  # Upsert requests in flight at once
+    UPSERT_MAX_RETRIES = 3
+    UPSERT_RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry
+
+    # Query result cache
+    QUERY_CACHE_ENABLED = True
+    QUERY_CACHE_SIZE = 1000  # Entries kept by the in-process cache
+    STORED_VECTOR_CACHE_SIZE = 5000  # Chunk vectors kept in memory for MMR
+    QUERY_CACHE_TTL = 3600  # Seconds
+    REDIS_URL = os.getenv("REDIS_URL")  # Shared cache backend; in-process cache when unset
+
+    # Semantic answer cache
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_SIMILARITY = 0.92  # Minimum cosine similarity between cached and new question
+    ANSWER_CACHE_TTL = 86400  # Seconds
+    ANSWER_CACHE_MAX_SETS = 5000  # Distinct supporting-chunk sets kept in process memory
+    ANSWER_CACHE_ENTRIES_PER_SET = 8
+
+    # Local FAISS backend
+    FAISS_DIR = DB_DIR / "faiss"
+    FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # "flat", "hnsw" or "ivf"
+    FAISS_HNSW_M = 32
+    FAISS_HNSW_EF_SEARCH = 64
+    FAISS_IVF_NLIST = 256
+    FAISS_IVF_NPROBE = 16
+    FAISS_IVF_MIN_POINTS_PER_LIST = 39  # IVF is trained once nlist * this many vectors exist
+    FAISS_MAX_TOMBSTONE_RATIO = 0.2  # Rebuild HNSW once this share of vectors is deleted
+    FAISS_FILTER_OVERFETCH = 10  # Candidates per requested result when filtering metadata
+
+    # Hybrid (BM25 + dense) retrieval
+    HYBRID_SEARCH_ENABLED = True
+    HYBRID_CANDIDATES = 20  # Results taken from each retriever before fusion
+    RRF_K = 60  # Reciprocal rank fusion constant
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+
+    # Context diversification
+    MMR_ENABLED = True
+    MMR_CANDIDATES = 20  # Candidates the k context chunks are selected from
+    MMR_LAMBDA = 0.7  # 1.0 ranks purely by relevance, lower values favour diversity
+    SHINGLE_SIZE = 5  # Words per shingle for near-duplicate detection
+    DUPLICATE_OVERLAP_THRESHOLD = 0.8  # Share of shingles contained in a kept chunk
+
+    # Prompt context packing
+    CONTEXT_TOKEN_BUDGET = 3000  # Tokens of retrieved context per prompt
+    CONTEXT_MIN_SCORE_RATIO = 0.5  # Skip reranked chunks scoring below this share of the best
+    CONTEXT_MIN_TRUNCATED_TOKENS = 64  # Smallest truncated chunk worth including
+    TOKEN_COUNT_CACHE_SIZE = 50000
+
+    # Conversation history
+    HISTORY_TOKEN_BUDGET = 1000  # Tokens of summary plus recent messages per prompt
+    HISTORY_SUMMARY_TOKENS = 200  # Maximum length of the rolling summary
+
+    # Streaming output
+    STREAM_FLUSH_INTERVAL = 0.1  # Seconds between redraws of a streaming answer
+    STREAM_FLUSH_CHARS = 400  # Buffered characters that force a redraw
+
     ########### Temporary local storage
     TEMP_DIR = BASE_DIR / "temp"
-    TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
 
     ############
+    RERANKER_ENABLED = True
     RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     RERANKER_BATCH_SIZE = 32
+    RERANKER_CANDIDATES = 20  # Retrieved candidates scored per query
+    RERANKER_LATENCY_BUDGET = 0.3  # Seconds; later batches are skipped once spent
+    RERANKER_MAX_UNSCORED = 5  # Unscored candidates kept, in retrieval order, once the budget is spent
+    RERANK_CACHE_SIZE = 10000  # Cached (query, chunk) scores
     MIN_RELEVANCE_SCORE = 0.3
     
     # Performance settings
     EMBEDDING_BATCH_SIZE = 32
+    EMBEDDING_MICROBATCH_ENABLED = True  # Batch concurrent query embeddings across sessions
+    EMBEDDING_BATCH_WINDOW = 0.005  # Seconds a query waits for others to share its batch
+    EMBEDDING_CACHE_ENABLED = True  # Disk-backed cache of document embeddings under CACHE_DIR
+    QUERY_EMBEDDING_CACHE_SIZE = 10000
     USE_GPU = False  # Set to True if GPU is available
     CACHE_DIR = BASE_DIR / "storage" / "cache"
-    
-    # Create cache directory
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-    
+    def validate(self):
+        """Raise if settings required by the configured services are missing."""
+        missing = []
+        if not self.OPENAI_API_KEY:
+            missing.append("OPENAI_API_KEY")
+        if self.VECTOR_BACKEND == "pinecone":
+            if not self.PINECONE_API_KEY:
+                missing.append("PINECONE_API_KEY")
+            if not self.PINECONE_ENVIRONMENT:
+                missing.append("PINECONE_ENVIRONMENT")
+        if missing:
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing)}\n"
+                "Please ensure these variables are set in your .env file or environment."
+            )
+
+    def index_key(self) -> str:
+        """Name of the active vector index; caches of its search results are kept per index."""
+        if self.VECTOR_BACKEND == "faiss":
+            return f"faiss-{hashlib.md5(str(Path(self.FAISS_DIR).resolve()).encode()).hexdigest()[:8]}"
+        return f"{self.VECTOR_BACKEND}-{self.PINECONE_INDEX_NAME}"
+
+    def index_state_dir(self) -> Path:
+        """Directory for state that describes the active vector index (manifest, BM25 index)."""
+        if self.VECTOR_BACKEND == "faiss":
+            return Path(self.FAISS_DIR)
+        return self.DB_DIR / self.index_key()
+
+    def ensure_directories(self):
+        """Create the local data and storage directories if they don't exist."""
+        for directory in (self.DATA_DIR, self.DB_DIR, self.TEMP_DIR, self.CACHE_DIR):
+            directory.mkdir(parents=True, exist_ok=True)
+
+
 config = Config()
\ No newline at end of file
@@ -13,4 +13,12 @@ def format_chat_history(history: List[Dict[str, Any]]) -> str:
         role = message["role"]
         content = message["content"]
         formatted.append(f"{role.capitalize()}: {content}")
-    return "\n".join(formatted)
\ No newline at end of file
+    return "\n".join(formatted)
+
+def hash_file(file_path, block_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in blocks so large files are not loaded at once."""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
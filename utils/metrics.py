@@ -0,0 +1,193 @@
+# utils/metrics.py
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from utils.config import config
+
+# Upper bounds in seconds, from cache hits to full LLM generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus sense."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NullSpan:
+    """Shared no-op span handed out while metrics are disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics: 'Metrics', stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# Observations of the profiled request this context belongs to, if any. Asyncio
+# tasks and asyncio.to_thread carry it over, so other requests' stages never mix in.
+_recording: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "metrics_recording", default=None
+)
+
+
+class Metrics:
+    """Per-process stage latency histograms exported in Prometheus text format.
+
+    `span(stage)` times a block; while METRICS_ENABLED is off it returns a
+    shared no-op object, so instrumented code pays one attribute check.
+    Quantities other than stage latencies go through `observe_value`, each
+    as its own histogram metric with its own buckets. With
+    METRICS_DIR set, a background thread writes this process's metrics to
+    `<pid>.prom` there every METRICS_FLUSH_INTERVAL seconds, in the layout
+    read by node_exporter's textfile collector.
+    """
+    name = "rag_stage_seconds"
+
+    def __init__(self, enabled: bool = config.METRICS_ENABLED, directory: Optional[Path] = config.METRICS_DIR):
+        self.enabled = enabled
+        self.directory = Path(directory) if directory else None
+        self._histograms: Dict[str, Histogram] = {}
+        self._values: Dict[str, Tuple[str, Histogram]] = {}  # metric name -> (help, histogram)
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    @property
+    def active(self) -> bool:
+        """Whether observations are kept, for the histograms or a profiling recorder."""
+        return self.enabled or _recording.get() is not None
+
+    def span(self, stage: str):
+        if not self.active:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    @contextmanager
+    def record(self) -> Iterator[List[Tuple[str, float]]]:
+        """Collect every (stage, seconds) observed in this context while the block runs.
+
+        Works even when metrics are disabled. Stages run by other requests are
+        not included; work handed to plain threads is only included when the
+        context is copied along, as asyncio.to_thread does.
+        """
+        observations: List[Tuple[str, float]] = []
+        token = _recording.set(observations)
+        try:
+            yield observations
+        finally:
+            _recording.reset(token)
+
+    def observe(self, stage: str, seconds: float):
+        observations = _recording.get()
+        if observations is not None:
+            observations.append((stage, seconds))
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+        if self.directory is not None and self._flusher is None:
+            self._start_flusher()
+
+    def observe_value(self, name: str, value: float, buckets: Sequence[float], help: str = ""):
+        """Record a non-latency quantity, e.g. a batch size, in histogram `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is None:
+                entry = self._values[name] = (help, Histogram(buckets))
+            entry[1].observe(value)
+        if self.directory is not None and self._flusher is None:
+            self._start_flusher()
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, labels: str, histogram: Histogram):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    def render(self) -> str:
+        """All histograms in Prometheus text exposition format."""
+        process = f'process="{os.getpid()}"'
+        lines = [
+            f"# HELP {self.name} Latency of pipeline stages in seconds.",
+            f"# TYPE {self.name} histogram"
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                self._render_histogram(lines, self.name, f'stage="{stage}",{process}', histogram)
+            for name, (help, histogram) in sorted(self._values.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} histogram")
+                self._render_histogram(lines, name, process, histogram)
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Write this process's metrics atomically to METRICS_DIR."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}.prom"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(self.render())
+        os.replace(tmp_path, path)
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(config.METRICS_FLUSH_INTERVAL)
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Count and mean latency per stage."""
+        with self._lock:
+            return {
+                stage: {'count': h.count, 'mean': h.sum / h.count if h.count else 0.0}
+                for stage, h in self._histograms.items()
+            }
+
+
+metrics = Metrics()
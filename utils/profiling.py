@@ -0,0 +1,94 @@
+# utils/profiling.py
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from utils.config import config
+from utils.metrics import metrics
+
+# cProfile and tracemalloc are process-wide, so only one request is profiled at a time
+_profiling = threading.Lock()
+
+
+def should_profile(requested: bool = False) -> bool:
+    """Profile when asked to, or for a PROFILING_SAMPLE_RATE share of requests when enabled."""
+    return requested or (config.PROFILING_ENABLED and random.random() < config.PROFILING_SAMPLE_RATE)
+
+
+@contextmanager
+def profiled(name: str, requested: bool = False, metadata: Optional[Dict] = None) -> Iterator[Optional[Path]]:
+    """Capture a CPU profile, allocations and stage timings of the enclosed block.
+
+    Yields the dump directory under CACHE_DIR/profiles, or None when this
+    request is not profiled. The directory holds:
+
+    - cpu.prof: cProfile stats of the calling thread, loadable with pstats.
+    - cpu.txt: the top functions by cumulative time.
+    - memory.snapshot and memory.txt: a tracemalloc snapshot, and the lines
+      that allocated the most while the block ran.
+    - timings.json: the stage timings recorded for this request.
+
+    Work on other threads and processes appears in the CPU profile only as
+    waiting time; stage timings from threads are included when they run with
+    this request's context (asyncio.to_thread, the ingestion upserter).
+    While another request is being profiled this one is not, and None is
+    yielded.
+    """
+    if not should_profile(requested) or not _profiling.acquire(blocking=False):
+        yield None
+        return
+    try:
+        with _profile(name, metadata) as directory:
+            yield directory
+    finally:
+        _profiling.release()
+
+
+@contextmanager
+def _profile(name: str, metadata: Optional[Dict]) -> Iterator[Path]:
+    directory = config.CACHE_DIR / "profiles" / (
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)[:60]}-{os.getpid()}"
+    )
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(config.PROFILING_TRACEMALLOC_FRAMES)
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+
+    with metrics.record() as timings:
+        profiler.enable()
+        try:
+            yield directory
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+            directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(directory / "cpu.prof"))
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(50)
+            (directory / "cpu.txt").write_text(report.getvalue())
+
+            after.dump(str(directory / "memory.snapshot"))
+            top = after.compare_to(before, "lineno")[:50]
+            (directory / "memory.txt").write_text("\n".join(str(stat) for stat in top))
+
+            (directory / "timings.json").write_text(json.dumps({
+                'name': name,
+                'total_seconds': elapsed,
+                'stages': [{'stage': stage, 'seconds': seconds} for stage, seconds in timings],
+                **(metadata or {})
+            }, indent=2, default=str))
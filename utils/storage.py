@@ -0,0 +1,39 @@
+# utils/storage.py
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+SQLITE_BATCH_SIZE = 500  # Stay below SQLite's bound-parameter limit
+
+
+@contextmanager
+def file_lock(path: Path, thread_lock: Optional[threading.RLock] = None):
+    """Exclusive lock shared by threads (through `thread_lock`) and processes (through `path`)."""
+    if thread_lock is not None:
+        thread_lock.acquire()
+    try:
+        with open(path, 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        if thread_lock is not None:
+            thread_lock.release()
+
+
+def in_batches(values: Sequence, size: int = SQLITE_BATCH_SIZE) -> Iterator[Tuple[List, str]]:
+    """Split values for `IN (...)` clauses: yields each batch with its '?,?,...' placeholders."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        batch = values[i:i + size]
+        yield batch, ",".join("?" * len(batch))